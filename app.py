@@ -1,4 +1,4 @@
-from flask import Flask, render_template, request, jsonify, send_file
+from flask import Flask, render_template, request, jsonify, send_file, Response, stream_with_context
 import json
 from datetime import datetime
 import io
@@ -15,17 +15,37 @@ import os
 from huggingface_hub import InferenceClient
 
 import database
+import http_client
+import marketplaces
 import mock_data
+import price_refresh
+from community_deals import CommunityDeals
 
 app = Flask(__name__)
 app.secret_key = os.environ.get('SESSION_SECRET', 'dev-secret-key-change-in-production')
 
 # Initialize database
 database.init_db()
+database.init_app(app)
 
 # HuggingFace client for AI features (with token from environment)
 HF_TOKEN = os.environ.get('HUGGINGFACE_TOKEN')
 hf_client = InferenceClient(token=HF_TOKEN) if HF_TOKEN else None
+# Host the HF client's calls are limited and timed under in http_client
+HF_HOST = 'huggingface.co'
+
+# Refresh watchlist prices in the background when an interval is configured
+PRICE_REFRESH_INTERVAL = os.environ.get('PRICE_REFRESH_INTERVAL')
+if PRICE_REFRESH_INTERVAL:
+    price_refresh.start_background(int(PRICE_REFRESH_INTERVAL))
+
+# Optionally pick up catalog file changes while running
+CATALOG_RELOAD_INTERVAL = os.environ.get('CATALOG_RELOAD_INTERVAL')
+if CATALOG_RELOAD_INTERVAL:
+    mock_data.watch_catalog(int(CATALOG_RELOAD_INTERVAL))
+
+# Community deals leaderboard, served from memory
+community_board = CommunityDeals('community-deals.json')
 
 @app.route('/')
 def index():
@@ -41,6 +61,7 @@ def search():
     discount_only = request.args.get('discount_only') == 'true'
     sort_by = request.args.get('sort_by', 'relevance')
     page = int(request.args.get('page', 1))
+    cursor = request.args.get('cursor')
     
     filters = {
         'marketplace': marketplace,
@@ -49,11 +70,15 @@ def search():
         'sort_by': sort_by
     }
     
-    search_result = mock_data.search_products(query, filters, page=page, per_page=50)
+    try:
+        search_result = mock_data.search_products(query, filters, page=page, per_page=50, cursor=cursor, facets=True)
+    except ValueError:
+        return "Invalid cursor", 400
     
-    # Check which products are in watchlist
+    # Check which products are in watchlist, in one query for the whole page
+    watched = database.watchlist_membership(p['id'] for p in search_result['products'])
     for product in search_result['products']:
-        product['in_watchlist'] = database.is_in_watchlist(product['id'])
+        product['in_watchlist'] = product['id'] in watched
     
     return render_template('search_results.html', 
                          query=query, 
@@ -61,15 +86,85 @@ def search():
                          total=search_result['total'],
                          page=search_result['page'],
                          total_pages=search_result['total_pages'],
+                         next_cursor=search_result['next_cursor'],
+                         facets=search_result['facets'],
                          filters=filters)
 
+@app.route('/api/search')
+def api_search():
+    """Search all marketplaces, streaming results as NDJSON.
+
+    Writes one {"type": "products"} line per marketplace as soon as it
+    responds, then a {"type": "done"} line with every source's status.
+    """
+    query = request.args.get('q', '')
+    limit = min(int(request.args.get('limit', 50)), 200)
+    marketplace = request.args.get('marketplace', 'all')
+    filters = {
+        'free_shipping': request.args.get('free_shipping') == 'true',
+        'discount_only': request.args.get('discount_only') == 'true',
+        'sort_by': request.args.get('sort_by', 'relevance')
+    }
+    selected = None if marketplace == 'all' else [marketplace]
+    
+    def generate():
+        sources = {}
+        total = 0
+        for source, products, status in marketplaces.fan_out(query, filters, limit, selected):
+            sources[source] = status
+            if not products:
+                continue
+            total += len(products)
+            # Stored images or placeholders; don't hold the stream for resolution
+            mock_data.resolve_images(products, timeout=0)
+            watched = database.watchlist_membership(p['id'] for p in products)
+            for product in products:
+                product['in_watchlist'] = product['id'] in watched
+            yield json.dumps({
+                'type': 'products',
+                'source': source,
+                'products': [product.to_dict() for product in products]
+            }) + '\n'
+        
+        yield json.dumps({
+            'type': 'done',
+            'total': total,
+            'sources': sources,
+            'partial': any(status['status'] != 'ok' for status in sources.values())
+        }) + '\n'
+    
+    return Response(stream_with_context(generate()), mimetype='application/x-ndjson')
+
+@app.route('/api/suggest')
+def suggest():
+    """Search suggestions for the text typed so far"""
+    query = request.args.get('q', '')
+    limit = min(int(request.args.get('limit', 8)), 20)
+    return jsonify({'query': query, 'suggestions': mock_data.suggest_products(query, limit)})
+
+@app.route('/api/status/search-cache')
+def search_cache_status():
+    """Search result cache hit/miss counters"""
+    return jsonify(mock_data.search_cache.stats())
+
+@app.route('/api/status/http')
+def http_status():
+    """Outbound request counters and timings per host"""
+    return jsonify(http_client.client.stats())
+
+@app.route('/api/status/breakers')
+def breaker_status():
+    """Circuit breaker state per outbound host"""
+    return jsonify(http_client.client.breaker_stats())
+
 @app.route('/product/<product_id>')
 def product_detail(product_id):
     """Product detail page with price history"""
-    product = mock_data.get_product_by_id(product_id)
+    products = mock_data.get_products_by_ids([product_id])
     
-    if not product:
+    if not products:
         return "Product not found", 404
+    product = products[0]
     
     # Get price history from database or generate mock data
     db_history = database.get_price_history(product_id)
@@ -77,9 +172,9 @@ def product_detail(product_id):
     if db_history:
         price_history = [{'date': row[1], 'price': row[0]} for row in db_history]
     else:
-        price_history = mock_data.generate_price_history(product['price'])
+        price_history = mock_data.generate_price_history(product['price'], product_id=product_id)
     
-    product['in_watchlist'] = database.is_in_watchlist(product_id)
+    product['in_watchlist'] = product_id in database.watchlist_membership([product_id])
     
     return render_template('product_detail.html', 
                          product=product,
@@ -145,11 +240,12 @@ def ai_summary():
     
     try:
         # Use HuggingFace's free inference API for text generation
-        response = hf_client.text_generation(
-            f"Summarize this product in 2-3 sentences: {product_text}",
-            model="microsoft/Phi-3-mini-4k-instruct",
-            max_new_tokens=100
-        )
+        with http_client.client.limited(HF_HOST, timeout=5):
+            response = hf_client.text_generation(
+                f"Summarize this product in 2-3 sentences: {product_text}",
+                model="microsoft/Phi-3-mini-4k-instruct",
+                max_new_tokens=100
+            )
         
         summary = response if isinstance(response, str) else str(response)
         
@@ -158,12 +254,40 @@ def ai_summary():
             'summary': summary
         })
     except Exception as e:
-        # Graceful fallback on error (API unavailable, rate limit, or no token)
+        # Graceful fallback on error (API unavailable or marked down, rate limit, or no token)
         return jsonify({
             'success': True,
             'summary': f"Smart product analysis: {data['name'][:100]}. This product features competitive pricing and quality construction. Based on marketplace data, it represents good value in its category."
         })
 
+def trend_advice(current_price, avg_price, lowest_price):
+    """Buy recommendation from where the current price sits in its history"""
+    if current_price <= lowest_price:
+        return "🔥 Best price ever! This is the lowest price we've tracked. Excellent time to buy!"
+    elif current_price < avg_price * 0.9:
+        return "🎯 Great deal! Price is 10% below recent average. Strong buy recommendation."
+    elif current_price < avg_price:
+        return "👍 Good price. Below recent average. Consider buying if you need it."
+    elif current_price > avg_price * 1.15:
+        return "⏳ Consider waiting. Price is 15% above recent average. May drop soon."
+    elif current_price > avg_price * 1.05:
+        return "⚠️ Slightly high. Price is above recent average. You might find better deals."
+    else:
+        return "📊 Fair price. Around the average. Buy if you need it now."
+
+def discount_advice(discount):
+    """Buy recommendation from the discount alone, when there is no price history"""
+    if discount > 60:
+        return "🔥 Amazing discount! Over 60% off is exceptional. Great time to buy!"
+    elif discount > 40:
+        return "🎯 Excellent discount! Over 40% savings. Strong buy recommendation."
+    elif discount > 20:
+        return "👍 Good discount. 20%+ savings is worthwhile."
+    elif discount > 0:
+        return "📊 Modest discount. Consider if you need the product."
+    else:
+        return "💡 Regular price. Check competitors or wait for sales."
+
 @app.route('/api/ai/buy-advice', methods=['POST'])
 def buy_advice():
     """AI-powered buy now recommendation"""
@@ -179,31 +303,10 @@ def buy_advice():
             recent_prices = [p['price'] for p in price_history[-7:]]
             avg_price = sum(recent_prices) / len(recent_prices)
             lowest_price = min([p['price'] for p in price_history])
-            highest_price = max([p['price'] for p in price_history])
             
-            if current_price <= lowest_price:
-                advice = "🔥 Best price ever! This is the lowest price we've tracked. Excellent time to buy!"
-            elif current_price < avg_price * 0.9:
-                advice = "🎯 Great deal! Price is 10% below recent average. Strong buy recommendation."
-            elif current_price < avg_price:
-                advice = "👍 Good price. Below recent average. Consider buying if you need it."
-            elif current_price > avg_price * 1.15:
-                advice = "⏳ Consider waiting. Price is 15% above recent average. May drop soon."
-            elif current_price > avg_price * 1.05:
-                advice = "⚠️ Slightly high. Price is above recent average. You might find better deals."
-            else:
-                advice = "📊 Fair price. Around the average. Buy if you need it now."
+            advice = trend_advice(current_price, avg_price, lowest_price)
         else:
-            if discount > 60:
-                advice = "🔥 Amazing discount! Over 60% off is exceptional. Great time to buy!"
-            elif discount > 40:
-                advice = "🎯 Excellent discount! Over 40% savings. Strong buy recommendation."
-            elif discount > 20:
-                advice = "👍 Good discount. 20%+ savings is worthwhile."
-            elif discount > 0:
-                advice = "📊 Modest discount. Consider if you need the product."
-            else:
-                advice = "💡 Regular price. Check competitors or wait for sales."
+            advice = discount_advice(discount)
         
         return jsonify({
             'success': True,
@@ -215,6 +318,26 @@ def buy_advice():
             'advice': '📊 Price analysis unavailable. Review the price history chart and make an informed decision based on your needs.'
         })
 
+@app.route('/api/ai/buy-advice/<product_id>')
+def buy_advice_for_product(product_id):
+    """Buy now recommendation from the product's precomputed price statistics"""
+    stats = database.get_price_stats(product_id)
+    product = mock_data.get_catalog().get(product_id)
+    
+    if stats and stats['count'] >= 2:
+        avg_price = stats['avg_7d'] or stats['avg_30d'] or stats['last_price']
+        advice = trend_advice(stats['last_price'], avg_price, stats['min_price'])
+    elif product:
+        advice = discount_advice(product['discount'])
+    else:
+        return jsonify({'success': False, 'error': 'Product not found'}), 404
+    
+    return jsonify({
+        'success': True,
+        'advice': advice,
+        'stats': stats
+    })
+
 @app.route('/api/ai/review-check', methods=['POST'])
 def review_check():
     """Check for suspicious reviews"""
@@ -289,24 +412,10 @@ def review_check():
 @app.route('/community')
 def community():
     """Community deals page"""
-    with open('community-deals.json', 'r') as f:
-        deals = json.load(f)
-    
-    # Add local upvote counts and validate images
-    for deal in deals:
-        local_upvotes = database.get_deal_upvotes(deal['id'])
-        deal['total_upvotes'] = deal['upvotes'] + local_upvotes
-        deal['user_upvoted'] = local_upvotes > 0
-        
-        # Validate and get working image URL, try scraping if needed
-        deal['image'] = mock_data.get_validated_image(
-            deal.get('image', ''),
-            deal['title'],
-            deal.get('url')
-        )
+    deals = community_board.leaderboard()
     
-    # Sort by total upvotes
-    deals.sort(key=lambda x: x['total_upvotes'], reverse=True)
+    # Resolve all deal images concurrently, with placeholders for any too slow
+    mock_data.resolve_images(deals, name_key='title')
     
     return render_template('community.html', deals=deals)
 
@@ -314,7 +423,7 @@ def community():
 def upvote_deal():
     """Upvote a community deal"""
     data = request.json
-    database.upvote_deal(data['deal_id'])
+    community_board.upvote(data['deal_id'])
     return jsonify({'success': True})
 
 @app.route('/export/pdf')
@@ -386,11 +495,8 @@ def compare():
     """Side-by-side product comparison"""
     product_ids = request.args.getlist('products')
     
-    products = []
-    for pid in product_ids[:4]:  # Max 4 products
-        product = mock_data.get_product_by_id(pid)
-        if product:
-            products.append(product)
+    # Max 4 products, looked up and given images in one batch
+    products = mock_data.get_products_by_ids(product_ids[:4])
     
     return render_template('compare.html', products=products)
 
@@ -0,0 +1,62 @@
+"""Compare the streaming image extractor with a full BeautifulSoup parse.
+
+Run from the repository root:
+
+    python benchmarks/image_extraction.py
+
+For each saved page in benchmarks/fixtures it reports time per page, peak
+Python memory and bytes read, and checks that both find the same image.
+"""
+import os
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import image_extractor
+
+FIXTURES = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures')
+
+# Fixture file -> the product URL it stands in for
+PAGES = {
+    'amazon_product.html': 'https://www.amazon.com/dp/B09XS7JWHH',
+    'ebay_product.html': 'https://www.ebay.com/itm/1234567890',
+    'generic_product.html': 'https://shop.example.com/products/headphones',
+    'no_image.html': 'https://shop.example.com/products/unknown',
+}
+
+REPEAT = 20
+
+def chunked(data, size=image_extractor.CHUNK_SIZE):
+    for i in range(0, len(data), size):
+        yield data[i:i + size]
+
+def measure(run):
+    """Get (seconds per run, peak traced bytes, result)"""
+    start = time.perf_counter()
+    for _ in range(REPEAT):
+        result = run()
+    elapsed = (time.perf_counter() - start) / REPEAT
+
+    tracemalloc.start()
+    run()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return elapsed, peak, result
+
+def main():
+    print(f"{'page':<22}{'size':>9}{'soup ms':>10}{'stream ms':>11}{'soup KB':>10}{'stream KB':>11}{'read':>9}  same")
+    for name, url in PAGES.items():
+        with open(os.path.join(FIXTURES, name), 'rb') as f:
+            data = f.read()
+
+        soup_time, soup_peak, soup_image = measure(lambda: image_extractor.extract_image_soup(data, url))
+        stream_time, stream_peak, (stream_image, read) = measure(
+            lambda: image_extractor.extract_image_streaming(chunked(data), url))
+
+        print(f"{name:<22}{len(data):>9}{soup_time * 1000:>10.1f}{stream_time * 1000:>11.1f}"
+              f"{soup_peak / 1024:>10.0f}{stream_peak / 1024:>11.0f}{read:>9}  {soup_image == stream_image}")
+
+if __name__ == '__main__':
+    main()
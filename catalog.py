@@ -0,0 +1,413 @@
+import argparse
+import json
+import math
+import random
+import resource
+import string
+import time
+from array import array
+from bisect import bisect_left
+
+import numpy as np
+
+from products import Product
+
+# sort_by option -> (column, descending). Anything else keeps catalog order.
+SORT_COLUMNS = {
+    'price_low': ('price', False),
+    'price_high': ('price', True),
+    'discount': ('discount', True),
+    'delivery': ('delivery_days', False),
+}
+
+# BM25 parameters. Name matches count NAME_BOOST times a description match,
+# and a token that merely contains a query term (e.g. 'phone' in
+# 'headphones') counts PARTIAL_MATCH_WEIGHT of an exact one.
+BM25_K1 = 1.2
+BM25_B = 0.75
+NAME_BOOST = 2.0
+PARTIAL_MATCH_WEIGHT = 0.5
+
+# Facet bucket edges: a bucket holds values from its edge up to the next one
+PRICE_BUCKETS = [0, 25, 50, 100, 250, 500, 1000]
+DELIVERY_BUCKETS = [0, 3, 6, 11]
+
+
+def bucket_label(edges, i, unit='', inclusive=False):
+    """Label bucket i of edges, e.g. '$25-50', '3-5' (inclusive) or '$1000+'"""
+    if i == len(edges) - 1:
+        return f"{unit}{edges[i]}+"
+    upper = edges[i + 1] - 1 if inclusive else edges[i + 1]
+    return f"{unit}{edges[i]}-{upper}"
+
+
+def tokenize(text):
+    """Split text into lowercase whitespace-delimited tokens"""
+    return text.lower().split()
+
+
+def load_products(path):
+    """Read Products from a JSON Lines file, one product object per line"""
+    with open(path, encoding='utf-8') as f:
+        return [Product.from_dict(json.loads(line)) for line in f if line.strip()]
+
+
+def save_products(products, path):
+    """Write product dicts to a JSON Lines file"""
+    with open(path, 'w', encoding='utf-8') as f:
+        for product in products:
+            f.write(json.dumps(product, ensure_ascii=False))
+            f.write('\n')
+
+
+# Vocabulary for synthetic catalogs
+SYNTHETIC_MARKETPLACES = {
+    'Amazon': ('amz', 'https://www.amazon.com/dp/'),
+    'eBay': ('ebay', 'https://www.ebay.com/itm/'),
+    'AliExpress': ('ali', 'https://www.aliexpress.com/item/'),
+    'Temu': ('temu', 'https://www.temu.com/goods/'),
+    'Jumia': ('jumia', 'https://www.jumia.com.ng/product/'),
+}
+SYNTHETIC_BRANDS = ['Sony', 'Samsung', 'Apple', 'Anker', 'Logitech', 'Philips', 'Xiaomi', 'Lenovo',
+                    'Bose', 'JBL', 'Canon', 'Nike', 'Adidas', 'Dyson', 'Ninja', 'Tefal', 'Garmin', 'Asus']
+SYNTHETIC_ADJECTIVES = ['Wireless', 'Portable', 'Smart', 'Compact', 'Pro', 'Ultra', 'Mini', 'Premium',
+                        'Waterproof', 'Rechargeable', 'Foldable', 'Ergonomic', 'Digital', 'Classic']
+SYNTHETIC_NOUNS = ['Headphones', 'Earbuds', 'Speaker', 'Keyboard', 'Mouse', 'Monitor', 'Laptop',
+                   'Tablet', 'Smartwatch', 'Camera', 'Charger', 'Blender', 'Air Fryer', 'Vacuum',
+                   'Sneakers', 'Backpack', 'Lamp', 'Router', 'Power Bank', 'Fitness Tracker']
+SYNTHETIC_FEATURES = ['long battery life', 'fast charging', 'noise cancellation', 'a slim design',
+                      'Bluetooth 5.3', 'a 2-year warranty', 'USB-C', 'voice control', 'a metal body',
+                      'a touch panel', 'low power use', 'a travel case']
+
+
+def generate_products(count, seed=0):
+    """Make count random but plausible product dicts, the same ones for the same seed"""
+    rng = random.Random(seed)
+    marketplaces = list(SYNTHETIC_MARKETPLACES.items())
+    products = []
+    for i in range(count):
+        marketplace, (prefix, base_url) = marketplaces[i % len(marketplaces)]
+        noun = rng.choice(SYNTHETIC_NOUNS)
+        name = f"{rng.choice(SYNTHETIC_BRANDS)} {rng.choice(SYNTHETIC_ADJECTIVES)} {noun} {rng.choice('ABCDEFGHKMSXZ')}{rng.randint(1, 999)}"
+        original_price = round(rng.uniform(5, 1500), 2)
+        discount = rng.choice((0, 0, 0, 5, 10, 15, 20, 25, 30, 40, 50))
+        features = rng.sample(SYNTHETIC_FEATURES, 2)
+        products.append({
+            'id': f"{prefix}_{i:07d}",
+            'name': name,
+            'marketplace': marketplace,
+            'price': round(original_price * (100 - discount) / 100, 2),
+            'original_price': original_price,
+            'discount': discount,
+            'image': '',
+            'url': f"{base_url}{i:07d}",
+            'free_shipping': rng.random() < 0.6,
+            'rating': round(rng.uniform(3.0, 5.0), 1),
+            'reviews': int(rng.paretovariate(1.2) * 10),
+            'delivery_days': rng.randint(1, 20),
+            'description': f"{noun} with {features[0]} and {features[1]}."
+        })
+    return products
+
+
+def peak_rss_mb():
+    """Get this process's peak resident set size in MB (ru_maxrss is KB on Linux)"""
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+class Catalog:
+    """In-memory product catalog with an id index, a token index over
+    name/description and NumPy columns for filtering and sorting.
+
+    Products are addressed by position in the products list; postings, the
+    columns and the id index all use these positions.
+    """
+
+    def __init__(self, products):
+        self.products = products
+        self.by_id = {}
+
+        # One entry per token occurrence: (token id, product position, in name?)
+        vocabulary = {}
+        occurrence_tokens = array('q')
+        occurrence_positions = array('q')
+        occurrence_in_name = bytearray()
+        name_lengths = np.zeros(len(products), dtype=np.float32)
+        description_lengths = np.zeros(len(products), dtype=np.float32)
+
+        for position, product in enumerate(products):
+            self.by_id.setdefault(product.id, position)
+            name_tokens = tokenize(product.name)
+            description_tokens = tokenize(product.description)
+            name_lengths[position] = len(name_tokens)
+            description_lengths[position] = len(description_tokens)
+            for token in name_tokens + description_tokens:
+                occurrence_tokens.append(vocabulary.setdefault(token, len(vocabulary)))
+            occurrence_positions.extend([position] * (len(name_tokens) + len(description_tokens)))
+            occurrence_in_name += b'\x01' * len(name_tokens) + b'\x00' * len(description_tokens)
+
+        # Group occurrences by (token, position): sorting the combined key
+        # orders them by token, then by position within each token
+        keys = (np.frombuffer(occurrence_tokens, dtype=np.int64) * max(len(products), 1)
+                + np.frombuffer(occurrence_positions, dtype=np.int64))
+        keys, groups = np.unique(keys, return_inverse=True)
+        in_name = np.frombuffer(occurrence_in_name, dtype=bool)
+        name_counts = np.bincount(groups, weights=in_name, minlength=len(keys))
+        description_counts = np.bincount(groups, weights=~in_name, minlength=len(keys))
+        token_ids = keys // max(len(products), 1)
+        positions = (keys % max(len(products), 1)).astype(np.int32)
+
+        # token -> sorted array of product positions, and alongside it the
+        # token's BM25F term weight for each of those products: field term
+        # frequencies normalized by field length and boosted per field
+        average_name_length = max(float(name_lengths.mean()), 1.0) if len(products) else 1.0
+        average_description_length = max(float(description_lengths.mean()), 1.0) if len(products) else 1.0
+        name_norm = 1 - BM25_B + BM25_B * name_lengths / average_name_length
+        description_norm = 1 - BM25_B + BM25_B * description_lengths / average_description_length
+        weights = (NAME_BOOST * name_counts / name_norm[positions]
+                   + description_counts / description_norm[positions]).astype(np.float32)
+
+        # Each token's postings and weights are slices of the shared arrays
+        bounds = np.searchsorted(token_ids, np.arange(len(vocabulary) + 1)).tolist()
+        self.postings = {}
+        self.term_weights = {}
+        for token, token_id in vocabulary.items():
+            start, end = bounds[token_id], bounds[token_id + 1]
+            self.postings[token] = positions[start:end]
+            self.term_weights[token] = weights[start:end]
+
+        # Every suffix of every token, sorted, so a binary search finds all
+        # tokens that contain a term (a term is a prefix of one of their suffixes)
+        suffixes = []
+        for token in self.postings:
+            for i in range(len(token)):
+                suffixes.append((token[i:], token))
+        suffixes.sort()
+        self._suffixes = [s for s, _ in suffixes]
+        self._suffix_tokens = [t for _, t in suffixes]
+
+        self._build_columns()
+
+    def _build_columns(self):
+        """Copy the numeric fields and flags of every product into NumPy arrays"""
+        products = self.products
+        self.price = np.array([p.price for p in products], dtype=np.float64)
+        self.original_price = np.array([p.original_price or p.price for p in products], dtype=np.float64)
+        self.discount = np.array([p.discount for p in products], dtype=np.int16)
+        self.rating = np.array([p.rating for p in products], dtype=np.float32)
+        self.reviews = np.array([p.reviews for p in products], dtype=np.int64)
+        self.delivery_days = np.array([p.delivery_days for p in products], dtype=np.int16)
+        self.free_shipping = np.array([bool(p.free_shipping) for p in products], dtype=bool)
+
+        # Marketplaces as small integer codes into self.marketplaces
+        self.marketplaces = sorted({p.marketplace for p in products})
+        self.marketplace_codes = {name: code for code, name in enumerate(self.marketplaces)}
+        self.marketplace = np.array([self.marketplace_codes[p.marketplace] for p in products], dtype=np.int16)
+
+    def __len__(self):
+        return len(self.products)
+
+    def get(self, product_id):
+        """Get a Product by ID, or None"""
+        position = self.by_id.get(product_id)
+        if position is None:
+            return None
+        return self.products[position]
+
+    def tokens_containing(self, term):
+        """Get the set of indexed tokens that contain term as a substring"""
+        tokens = set()
+        i = bisect_left(self._suffixes, term)
+        while i < len(self._suffixes) and self._suffixes[i].startswith(term):
+            tokens.add(self._suffix_tokens[i])
+            i += 1
+        return tokens
+
+    def match_term(self, term):
+        """Get sorted positions of products whose name or description contains term"""
+        arrays = [self.postings[token] for token in self.tokens_containing(term)]
+        if not arrays:
+            return np.empty(0, dtype=np.int32)
+        if len(arrays) == 1:
+            return arrays[0]
+        # Union through a mask: linear, where np.unique would sort
+        mask = np.zeros(len(self.products), dtype=bool)
+        mask[np.concatenate(arrays)] = True
+        return np.flatnonzero(mask).astype(np.int32)
+
+    def match(self, query):
+        """Get sorted positions of products matching every term of query"""
+        terms = tokenize(query)
+        if not terms:
+            return np.arange(len(self.products), dtype=np.int32)
+
+        # Resolve terms one by one, narrowing the candidate set as we go
+        matched = None
+        for term in sorted(set(terms), key=len, reverse=True):
+            positions = self.match_term(term)
+            matched = positions if matched is None else np.intersect1d(matched, positions, assume_unique=True)
+            if not len(matched):
+                break
+        return matched
+
+    def filter(self, positions, free_shipping=False, discount_only=False, marketplace='all'):
+        """Narrow positions to products passing the filters, keeping their order"""
+        mask = np.ones(len(positions), dtype=bool)
+        if free_shipping:
+            mask &= self.free_shipping[positions]
+        if discount_only:
+            mask &= self.discount[positions] > 0
+        if marketplace and marketplace != 'all':
+            code = self.marketplace_codes.get(marketplace)
+            if code is None:
+                return positions[:0]
+            mask &= self.marketplace[positions] == code
+        return positions[mask]
+
+    def facet_counts(self, positions, free_shipping=False, discount_only=False, marketplace='all'):
+        """Count how many of positions each filter value would leave.
+
+        positions are the query matches before filtering. Each facet's counts
+        apply every active filter except its own, so they show what picking
+        that value would give. Price and delivery buckets apply all filters.
+        """
+        has_free_shipping = self.free_shipping[positions]
+        has_discount = self.discount[positions] > 0
+        codes = self.marketplace[positions]
+
+        everything = np.ones(len(positions), dtype=bool)
+        shipping_mask = has_free_shipping if free_shipping else everything
+        discount_mask = has_discount if discount_only else everything
+        if marketplace and marketplace != 'all':
+            marketplace_mask = codes == self.marketplace_codes.get(marketplace, -1)
+        else:
+            marketplace_mask = everything
+
+        marketplace_counts = np.bincount(codes[shipping_mask & discount_mask], minlength=len(self.marketplaces))
+        filtered = shipping_mask & discount_mask & marketplace_mask
+
+        price_buckets = np.searchsorted(PRICE_BUCKETS, self.price[positions[filtered]], side='right') - 1
+        price_counts = np.bincount(price_buckets, minlength=len(PRICE_BUCKETS))
+        delivery_buckets = np.searchsorted(DELIVERY_BUCKETS, self.delivery_days[positions[filtered]], side='right') - 1
+        delivery_counts = np.bincount(delivery_buckets, minlength=len(DELIVERY_BUCKETS))
+
+        return {
+            'marketplace': dict(zip(self.marketplaces, marketplace_counts.tolist())),
+            'free_shipping': int(np.count_nonzero(has_free_shipping & discount_mask & marketplace_mask)),
+            'discounted': int(np.count_nonzero(has_discount & shipping_mask & marketplace_mask)),
+            'price': {bucket_label(PRICE_BUCKETS, i, '$'): n for i, n in enumerate(price_counts.tolist())},
+            'delivery_days': {bucket_label(DELIVERY_BUCKETS, i, inclusive=True): n for i, n in enumerate(delivery_counts.tolist())}
+        }
+
+    def relevance_scores(self, positions, query):
+        """Get the BM25 score of each of positions for query"""
+        scores = np.zeros(len(positions), dtype=np.float64)
+        total = len(self.products)
+        if not len(positions):
+            return scores
+
+        # Terms and tokens in sorted order: set order depends on the
+        # per-process hash seed, and float sums on their order, so scores
+        # (and ties between them) must not differ between processes
+        for term in sorted(set(tokenize(query))):
+            tokens = sorted(self.tokens_containing(term))
+            if not tokens:
+                continue
+            token_positions = np.concatenate([self.postings[token] for token in tokens])
+            token_weights = np.concatenate([
+                self.term_weights[token] * (1.0 if token.strip(string.punctuation) == term else PARTIAL_MATCH_WEIGHT)
+                for token in tokens
+            ])
+
+            if len(positions) * 8 > total:
+                # Many candidates: accumulate over the whole catalog, then pick
+                term_weight = np.bincount(token_positions, weights=token_weights, minlength=total)[positions]
+            else:
+                # Few candidates: locate each posting among them (both sorted)
+                idx = np.searchsorted(positions, token_positions)
+                idx[idx == len(positions)] = 0
+                found = positions[idx] == token_positions
+                term_weight = np.bincount(idx[found], weights=token_weights[found], minlength=len(positions))
+
+            document_frequency = len(self.match_term(term))
+            idf = math.log(1 + (total - document_frequency + 0.5) / (document_frequency + 0.5))
+            scores += idf * term_weight * (BM25_K1 + 1) / (term_weight + BM25_K1)
+        return scores
+
+    def sort_keys(self, positions, sort_by, query=''):
+        """Get the ascending sort key of each position.
+
+        Relevance sorts by descending BM25 score for query, or by position
+        when there are no query terms.
+        """
+        spec = SORT_COLUMNS.get(sort_by)
+        if spec is None:
+            if tokenize(query):
+                return -self.relevance_scores(positions, query)
+            return positions
+        column, descending = spec
+        keys = getattr(self, column)[positions]
+        return -keys if descending else keys
+
+    def sort(self, positions, sort_by, query=''):
+        """Order positions by sort_by. Ties keep catalog order."""
+        return positions[np.argsort(self.sort_keys(positions, sort_by, query), kind='stable')]
+
+    def top_k(self, positions, sort_by, k, after=None, query=''):
+        """Get the first k of positions in sort_by order, ties in catalog order.
+
+        positions must be in ascending order, as match() and filter() return
+        them. after=(key, position) starts after that entry, for keyset
+        pagination. Costs O(n + k log k) rather than a full sort.
+        """
+        keys = self.sort_keys(positions, sort_by, query)
+        if after is not None:
+            after_key, after_position = after
+            keep = (keys > after_key) | ((keys == after_key) & (positions > after_position))
+            positions = positions[keep]
+            keys = keys[keep]
+
+        if k <= 0:
+            return positions[:0]
+        if k < len(positions):
+            # Everything below the k-th smallest key is in, then as many
+            # entries equal to it as fit, lowest positions first
+            kth = np.partition(keys, k - 1)[k - 1]
+            below = np.flatnonzero(keys < kth)
+            equal = np.flatnonzero(keys == kth)[:k - len(below)]
+            selected = np.concatenate((below, equal))
+            positions = positions[selected]
+            keys = keys[selected]
+        return positions[np.argsort(keys, kind='stable')]
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Generate or benchmark product catalog files')
+    commands = parser.add_subparsers(dest='command', required=True)
+    generate = commands.add_parser('generate', help='write a synthetic catalog')
+    generate.add_argument('--count', type=int, default=1_000_000, help='number of products')
+    generate.add_argument('--seed', type=int, default=0, help='random seed')
+    generate.add_argument('--output', required=True, help='JSON Lines file to write')
+    bench = commands.add_parser('bench', help='time loading a catalog and building its indexes')
+    bench.add_argument('path', help='JSON Lines catalog file')
+    args = parser.parse_args()
+
+    if args.command == 'generate':
+        save_products(generate_products(args.count, args.seed), args.output)
+        print(f"Wrote {args.count} products to {args.output}")
+        return
+
+    baseline = peak_rss_mb()
+    start = time.perf_counter()
+    products = load_products(args.path)
+    loaded = time.perf_counter()
+    catalog = Catalog(products)
+    built = time.perf_counter()
+    print(f"Products:  {len(catalog)}")
+    print(f"Load:      {loaded - start:.2f}s")
+    print(f"Index:     {built - loaded:.2f}s")
+    print(f"Peak RSS:  {peak_rss_mb():.0f} MB ({peak_rss_mb() - baseline:.0f} MB for the catalog)")
+
+
+if __name__ == '__main__':
+    main()
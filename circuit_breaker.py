@@ -0,0 +1,110 @@
+"""Circuit breakers that stop calling a dependency while it is failing"""
+import threading
+import time
+from collections import deque
+
+CLOSED = 'closed'
+OPEN = 'open'
+HALF_OPEN = 'half_open'
+
+# Open when at least this share of the last WINDOW calls failed, once
+# MIN_CALLS have been made
+FAILURE_RATE_THRESHOLD = 0.5
+WINDOW = 20
+MIN_CALLS = 5
+
+# Seconds to stay open before letting probe calls through
+RECOVERY_TIMEOUT = 30
+
+# Probe calls allowed while half-open; all must succeed to close again
+HALF_OPEN_PROBES = 1
+
+class CircuitOpenError(Exception):
+    """A call was skipped because its dependency's breaker is open"""
+
+class CircuitBreaker:
+    """Tracks a dependency's recent failures and decides whether to call it.
+
+    Closed: calls go through and their outcomes are recorded. Once the
+    failure rate over the last window calls reaches the threshold it opens.
+    Open: calls are refused until recovery_timeout has passed, then it
+    turns half-open. Half-open: up to probes calls go through; if they all
+    succeed it closes, and any failure opens it again.
+    """
+
+    def __init__(self, name, failure_rate=FAILURE_RATE_THRESHOLD, window=WINDOW, min_calls=MIN_CALLS,
+                 recovery_timeout=RECOVERY_TIMEOUT, probes=HALF_OPEN_PROBES):
+        self.name = name
+        self.failure_rate = failure_rate
+        self.min_calls = min_calls
+        self.recovery_timeout = recovery_timeout
+        self.probes = probes
+        self.state = CLOSED
+        self.rejected = 0
+        self._outcomes = deque(maxlen=window)
+        self._opened_at = 0.0
+        self._probes_started = 0
+        self._probes_passed = 0
+        self._lock = threading.Lock()
+
+    def _open(self):
+        self.state = OPEN
+        self._opened_at = time.monotonic()
+        self._outcomes.clear()
+
+    def allow(self):
+        """Whether a call may go ahead now. Every allowed call must be
+        followed by record() or cancel()."""
+        with self._lock:
+            if self.state == OPEN:
+                if time.monotonic() - self._opened_at < self.recovery_timeout:
+                    self.rejected += 1
+                    return False
+                self.state = HALF_OPEN
+                self._probes_started = 0
+                self._probes_passed = 0
+            if self.state == HALF_OPEN:
+                if self._probes_started >= self.probes:
+                    self.rejected += 1
+                    return False
+                self._probes_started += 1
+            return True
+
+    def record(self, success):
+        """Record the outcome of an allowed call"""
+        with self._lock:
+            if self.state == HALF_OPEN:
+                if not success:
+                    self._open()
+                else:
+                    self._probes_passed += 1
+                    if self._probes_passed >= self.probes:
+                        self.state = CLOSED
+                return
+            if self.state == OPEN:
+                # A call allowed before the breaker opened
+                return
+            self._outcomes.append(success)
+            failures = self._outcomes.count(False)
+            if len(self._outcomes) >= self.min_calls and failures / len(self._outcomes) >= self.failure_rate:
+                self._open()
+
+    def cancel(self):
+        """Forget an allowed call that never reached the dependency"""
+        with self._lock:
+            if self.state == HALF_OPEN and self._probes_started > self._probes_passed:
+                self._probes_started -= 1
+
+    def stats(self):
+        with self._lock:
+            calls = len(self._outcomes)
+            retry_in = None
+            if self.state == OPEN:
+                retry_in = round(max(self.recovery_timeout - (time.monotonic() - self._opened_at), 0), 1)
+            return {
+                'state': self.state,
+                'calls': calls,
+                'failure_rate': round(self._outcomes.count(False) / calls, 3) if calls else 0.0,
+                'rejected': self.rejected,
+                'retry_in': retry_in
+            }
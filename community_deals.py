@@ -0,0 +1,71 @@
+import json
+import os
+import threading
+import time
+
+import database
+
+# Seconds between re-reads of upvote counts, which other processes also write
+UPVOTE_REFRESH_INTERVAL = 5
+
+
+class CommunityDeals:
+    """Community deals leaderboard kept in memory.
+
+    The deals file is re-read only when its mtime changes. Local upvote counts
+    are fetched in one query on load and again every upvote_refresh seconds,
+    so upvotes recorded by other worker processes show up too; upvote()
+    updates this process's counts at once.
+    """
+
+    def __init__(self, path, upvote_refresh=UPVOTE_REFRESH_INTERVAL):
+        self.path = path
+        self.upvote_refresh = upvote_refresh
+        self._upvotes_loaded = 0.0
+        self._mtime = None
+        self._deals = []
+        self._local_upvotes = {}
+        self._leaderboard = []
+        self._lock = threading.Lock()
+
+    def _reload_if_changed(self):
+        """Reload deals if the deals file changed and upvote counts if they are stale. Caller holds the lock."""
+        mtime = os.stat(self.path).st_mtime
+        upvotes_stale = time.monotonic() - self._upvotes_loaded >= self.upvote_refresh
+        if mtime == self._mtime and not upvotes_stale:
+            return
+
+        if mtime != self._mtime:
+            with open(self.path, 'r') as f:
+                self._deals = json.load(f)
+            self._mtime = mtime
+        self._local_upvotes = database.get_all_deal_upvotes()
+        self._upvotes_loaded = time.monotonic()
+        self._rank()
+
+    def _rank(self):
+        """Rebuild the sorted leaderboard from deals and local upvotes. Caller holds the lock."""
+        leaderboard = []
+        for deal in self._deals:
+            local_upvotes = self._local_upvotes.get(deal['id'], 0)
+            entry = dict(deal)
+            entry['total_upvotes'] = deal['upvotes'] + local_upvotes
+            entry['user_upvoted'] = local_upvotes > 0
+            leaderboard.append(entry)
+
+        # Sort by total upvotes
+        leaderboard.sort(key=lambda x: x['total_upvotes'], reverse=True)
+        self._leaderboard = leaderboard
+
+    def leaderboard(self):
+        """Get deals sorted by total upvotes, as copies safe to modify"""
+        with self._lock:
+            self._reload_if_changed()
+            return [dict(deal) for deal in self._leaderboard]
+
+    def upvote(self, deal_id):
+        """Record an upvote and update the in-memory leaderboard"""
+        database.upvote_deal(deal_id)
+        with self._lock:
+            self._local_upvotes[deal_id] = self._local_upvotes.get(deal_id, 0) + 1
+            self._rank()
@@ -1,141 +1,356 @@
 import sqlite3
+import threading
 from datetime import datetime
 import json
 
 DB_NAME = 'database.db'
 
+# Prepared statements kept per connection by the sqlite3 module
+STATEMENT_CACHE_SIZE = 128
+
+# Seconds a writer waits for the database lock before giving up
+BUSY_TIMEOUT = 10
+
+# Seconds a product's rolling price averages are used before being
+# recomputed on read, so they keep moving while its price holds steady
+PRICE_STATS_MAX_AGE = 3600
+
+_local = threading.local()
+
+def get_connection():
+    """Get this thread's database connection, opening it on first use.
+
+    Connections are reused for the life of the thread. WAL journaling lets
+    readers proceed while another connection is writing.
+    """
+    conn = getattr(_local, 'conn', None)
+    if conn is not None and _local.db_name == DB_NAME:
+        return conn
+    if conn is not None:
+        conn.close()
+
+    conn = sqlite3.connect(DB_NAME, timeout=BUSY_TIMEOUT, cached_statements=STATEMENT_CACHE_SIZE)
+    conn.execute('PRAGMA journal_mode=WAL')
+    # NORMAL is durable in WAL mode except across power loss, and avoids an fsync per commit
+    conn.execute('PRAGMA synchronous=NORMAL')
+    _local.conn = conn
+    _local.db_name = DB_NAME
+    return conn
+
+def release_connection(exception=None):
+    """Roll back anything left uncommitted on this thread's connection, keeping it open for reuse"""
+    conn = getattr(_local, 'conn', None)
+    if conn is not None and conn.in_transaction:
+        conn.rollback()
+
+def close_connection():
+    """Close this thread's database connection"""
+    conn = getattr(_local, 'conn', None)
+    if conn is not None:
+        conn.close()
+        _local.conn = None
+
+def init_app(app):
+    """Release the thread's connection at the end of each Flask app context"""
+    app.teardown_appcontext(release_connection)
+
+# Schema migrations, applied in order. Each entry is a list of statements and
+# its position in the list (starting at 1) is the schema version it produces.
+# Never edit a migration that has shipped; append a new one instead.
+MIGRATIONS = [
+    # 1: base tables
+    [
+        # Price tracking table
+        '''CREATE TABLE IF NOT EXISTS price_history
+           (id INTEGER PRIMARY KEY AUTOINCREMENT,
+            product_id TEXT NOT NULL,
+            product_name TEXT NOT NULL,
+            marketplace TEXT NOT NULL,
+            price REAL NOT NULL,
+            timestamp DATETIME DEFAULT CURRENT_TIMESTAMP)''',
+
+        # Watchlist table
+        '''CREATE TABLE IF NOT EXISTS watchlist
+           (id INTEGER PRIMARY KEY AUTOINCREMENT,
+            product_id TEXT UNIQUE NOT NULL,
+            product_name TEXT NOT NULL,
+            marketplace TEXT NOT NULL,
+            current_price REAL NOT NULL,
+            original_price REAL,
+            image_url TEXT,
+            product_url TEXT,
+            added_date DATETIME DEFAULT CURRENT_TIMESTAMP)''',
+
+        # Community deals upvotes (stored locally)
+        '''CREATE TABLE IF NOT EXISTS deal_upvotes
+           (deal_id INTEGER PRIMARY KEY,
+            upvotes INTEGER DEFAULT 0)''',
+    ],
+    # 2: image URL validation results, shared between workers and restarts
+    [
+        '''CREATE TABLE IF NOT EXISTS image_validation
+           (url TEXT PRIMARY KEY,
+            valid INTEGER NOT NULL,
+            content_type TEXT,
+            checked_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+            failure_count INTEGER DEFAULT 0)''',
+    ],
+    # 3: indexes for per-product history lookups and the watchlist listing
+    [
+        'CREATE INDEX IF NOT EXISTS idx_price_history_product_time ON price_history (product_id, timestamp)',
+        'CREATE INDEX IF NOT EXISTS idx_watchlist_added_date ON watchlist (added_date)',
+    ],
+    # 4: per-product price statistics, kept current as price points are added
+    [
+        '''CREATE TABLE IF NOT EXISTS price_stats
+           (product_id TEXT PRIMARY KEY,
+            min_price REAL NOT NULL,
+            max_price REAL NOT NULL,
+            avg_7d REAL,
+            avg_30d REAL,
+            last_price REAL NOT NULL,
+            last_change REAL,
+            count INTEGER NOT NULL,
+            updated_at DATETIME DEFAULT CURRENT_TIMESTAMP)''',
+
+        # Backfill from existing history
+        '''INSERT OR REPLACE INTO price_stats
+               (product_id, min_price, max_price, avg_7d, avg_30d, last_price, last_change, count)
+           SELECT product_id, MIN(price), MAX(price),
+                  AVG(CASE WHEN timestamp >= datetime('now', '-7 days') THEN price END),
+                  AVG(CASE WHEN timestamp >= datetime('now', '-30 days') THEN price END),
+                  (SELECT price FROM price_history AS latest WHERE latest.product_id = p.product_id
+                   ORDER BY timestamp DESC, id DESC LIMIT 1),
+                  (SELECT price FROM price_history AS latest WHERE latest.product_id = p.product_id
+                   ORDER BY timestamp DESC, id DESC LIMIT 1)
+                  - (SELECT price FROM price_history AS previous WHERE previous.product_id = p.product_id
+                     ORDER BY timestamp DESC, id DESC LIMIT 1 OFFSET 1),
+                  COUNT(*)
+           FROM price_history AS p
+           GROUP BY product_id''',
+    ],
+]
+
+def get_schema_version(conn):
+    """Get the schema version of the database, 0 if it has never been migrated"""
+    c = conn.execute('SELECT MAX(version) FROM schema_version')
+    result = c.fetchone()
+    return result[0] or 0
+
+def migrate(conn):
+    """Apply any migrations newer than the database's schema version"""
+    conn.execute('''CREATE TABLE IF NOT EXISTS schema_version
+                    (version INTEGER PRIMARY KEY,
+                     applied_at DATETIME DEFAULT CURRENT_TIMESTAMP)''')
+
+    # IMMEDIATE takes the write lock up front, so workers starting together
+    # apply each migration once
+    conn.execute('BEGIN IMMEDIATE')
+    try:
+        version = get_schema_version(conn)
+        for number, statements in enumerate(MIGRATIONS[version:], start=version + 1):
+            for statement in statements:
+                conn.execute(statement)
+            conn.execute('INSERT INTO schema_version (version) VALUES (?)', (number,))
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+
 def init_db():
-    """Initialize the database with required tables"""
-    conn = sqlite3.connect(DB_NAME)
-    c = conn.cursor()
-    
-    # Price tracking table
-    c.execute('''CREATE TABLE IF NOT EXISTS price_history
-                 (id INTEGER PRIMARY KEY AUTOINCREMENT,
-                  product_id TEXT NOT NULL,
-                  product_name TEXT NOT NULL,
-                  marketplace TEXT NOT NULL,
-                  price REAL NOT NULL,
-                  timestamp DATETIME DEFAULT CURRENT_TIMESTAMP)''')
-    
-    # Watchlist table
-    c.execute('''CREATE TABLE IF NOT EXISTS watchlist
-                 (id INTEGER PRIMARY KEY AUTOINCREMENT,
-                  product_id TEXT UNIQUE NOT NULL,
-                  product_name TEXT NOT NULL,
-                  marketplace TEXT NOT NULL,
-                  current_price REAL NOT NULL,
-                  original_price REAL,
-                  image_url TEXT,
-                  product_url TEXT,
-                  added_date DATETIME DEFAULT CURRENT_TIMESTAMP)''')
-    
-    # Community deals upvotes (stored locally)
-    c.execute('''CREATE TABLE IF NOT EXISTS deal_upvotes
-                 (deal_id INTEGER PRIMARY KEY,
-                  upvotes INTEGER DEFAULT 0)''')
-    
-    conn.commit()
-    conn.close()
+    """Initialize the database, upgrading an existing one in place"""
+    migrate(get_connection())
+
+def _rolling_averages(conn, product_id):
+    """Get a product's (7-day, 30-day) average price from its history"""
+    # Read through the (product_id, timestamp) index, so the cost depends
+    # on the window, not the whole history
+    return conn.execute('''SELECT
+                               AVG(CASE WHEN timestamp >= datetime('now', '-7 days') THEN price END),
+                               AVG(price)
+                           FROM price_history
+                           WHERE product_id = ? AND timestamp >= datetime('now', '-30 days')''',
+                        (product_id,)).fetchone()
+
+def _record_price_point(conn, product_id, product_name, marketplace, price):
+    """Insert a price history row and update the product's price_stats. Runs in the caller's transaction."""
+    conn.execute('''INSERT INTO price_history (product_id, product_name, marketplace, price)
+                    VALUES (?, ?, ?, ?)''',
+                 (product_id, product_name, marketplace, price))
+
+    avg_7d, avg_30d = _rolling_averages(conn, product_id)
+
+    conn.execute('''INSERT INTO price_stats
+                        (product_id, min_price, max_price, avg_7d, avg_30d, last_price, last_change, count)
+                    VALUES (?, ?, ?, ?, ?, ?, NULL, 1)
+                    ON CONFLICT(product_id) DO UPDATE SET
+                        min_price = MIN(min_price, excluded.min_price),
+                        max_price = MAX(max_price, excluded.max_price),
+                        avg_7d = excluded.avg_7d,
+                        avg_30d = excluded.avg_30d,
+                        last_change = excluded.last_price - last_price,
+                        last_price = excluded.last_price,
+                        count = count + 1,
+                        updated_at = CURRENT_TIMESTAMP''',
+                 (product_id, price, price, avg_7d, avg_30d, price))
 
 def add_to_watchlist(product_id, product_name, marketplace, current_price, original_price=None, image_url=None, product_url=None):
     """Add a product to the watchlist"""
-    conn = sqlite3.connect(DB_NAME)
-    c = conn.cursor()
+    conn = get_connection()
     try:
-        c.execute('''INSERT INTO watchlist (product_id, product_name, marketplace, current_price, original_price, image_url, product_url)
-                     VALUES (?, ?, ?, ?, ?, ?, ?)''',
-                  (product_id, product_name, marketplace, current_price, original_price, image_url, product_url))
-        
-        # Also add to price history
-        c.execute('''INSERT INTO price_history (product_id, product_name, marketplace, price)
-                     VALUES (?, ?, ?, ?)''',
-                  (product_id, product_name, marketplace, current_price))
-        
-        conn.commit()
+        with conn:
+            conn.execute('''INSERT INTO watchlist (product_id, product_name, marketplace, current_price, original_price, image_url, product_url)
+                            VALUES (?, ?, ?, ?, ?, ?, ?)''',
+                         (product_id, product_name, marketplace, current_price, original_price, image_url, product_url))
+
+            # Also add to price history
+            _record_price_point(conn, product_id, product_name, marketplace, current_price)
         return True
     except sqlite3.IntegrityError:
         return False
-    finally:
-        conn.close()
 
 def remove_from_watchlist(product_id):
     """Remove a product from the watchlist"""
-    conn = sqlite3.connect(DB_NAME)
-    c = conn.cursor()
-    c.execute('DELETE FROM watchlist WHERE product_id = ?', (product_id,))
-    conn.commit()
-    conn.close()
+    conn = get_connection()
+    with conn:
+        conn.execute('DELETE FROM watchlist WHERE product_id = ?', (product_id,))
 
 def get_watchlist():
     """Get all products in the watchlist"""
-    conn = sqlite3.connect(DB_NAME)
-    c = conn.cursor()
-    c.execute('SELECT * FROM watchlist ORDER BY added_date DESC')
-    items = c.fetchall()
-    conn.close()
-    return items
+    conn = get_connection()
+    c = conn.execute('SELECT * FROM watchlist ORDER BY added_date DESC')
+    return c.fetchall()
 
 def is_in_watchlist(product_id):
     """Check if a product is in the watchlist"""
-    conn = sqlite3.connect(DB_NAME)
-    c = conn.cursor()
-    c.execute('SELECT id FROM watchlist WHERE product_id = ?', (product_id,))
-    result = c.fetchone()
-    conn.close()
-    return result is not None
+    conn = get_connection()
+    c = conn.execute('SELECT id FROM watchlist WHERE product_id = ?', (product_id,))
+    return c.fetchone() is not None
+
+def watchlist_membership(product_ids):
+    """Get the subset of product_ids that are in the watchlist, in one query per 500 ids"""
+    product_ids = list(product_ids)
+    conn = get_connection()
+    found = set()
+    for i in range(0, len(product_ids), 500):
+        chunk = product_ids[i:i + 500]
+        placeholders = ','.join('?' * len(chunk))
+        c = conn.execute(f'SELECT product_id FROM watchlist WHERE product_id IN ({placeholders})', chunk)
+        found.update(row[0] for row in c)
+    return found
 
 def add_price_history(product_id, product_name, marketplace, price):
     """Add a price point to the history"""
-    conn = sqlite3.connect(DB_NAME)
-    c = conn.cursor()
-    c.execute('''INSERT INTO price_history (product_id, product_name, marketplace, price)
-                 VALUES (?, ?, ?, ?)''',
-              (product_id, product_name, marketplace, price))
-    conn.commit()
-    conn.close()
+    conn = get_connection()
+    with conn:
+        _record_price_point(conn, product_id, product_name, marketplace, price)
 
 def get_price_history(product_id):
     """Get price history for a specific product"""
-    conn = sqlite3.connect(DB_NAME)
-    c = conn.cursor()
-    c.execute('''SELECT price, timestamp FROM price_history 
-                 WHERE product_id = ? 
-                 ORDER BY timestamp ASC''', (product_id,))
-    history = c.fetchall()
-    conn.close()
-    return history
+    conn = get_connection()
+    c = conn.execute('''SELECT price, timestamp FROM price_history
+                        WHERE product_id = ?
+                        ORDER BY timestamp ASC''', (product_id,))
+    return c.fetchall()
+
+def get_price_stats(product_id):
+    """Get precomputed price statistics for a product as a dict, or None.
+
+    Rolling averages older than PRICE_STATS_MAX_AGE are recomputed first,
+    as no price point is recorded while the price stays the same.
+    """
+    conn = get_connection()
+    c = conn.execute('''SELECT min_price, max_price, avg_7d, avg_30d, last_price, last_change, count,
+                               updated_at < datetime('now', ?)
+                        FROM price_stats WHERE product_id = ?''',
+                     (f'-{PRICE_STATS_MAX_AGE} seconds', product_id))
+    result = c.fetchone()
+    if result is None:
+        return None
+    keys = ('min_price', 'max_price', 'avg_7d', 'avg_30d', 'last_price', 'last_change', 'count')
+    stats = dict(zip(keys, result))
+    if result[-1]:
+        with conn:
+            stats['avg_7d'], stats['avg_30d'] = _rolling_averages(conn, product_id)
+            conn.execute('''UPDATE price_stats SET avg_7d = ?, avg_30d = ?, updated_at = CURRENT_TIMESTAMP
+                            WHERE product_id = ?''',
+                         (stats['avg_7d'], stats['avg_30d'], product_id))
+    return stats
 
 def update_watchlist_price(product_id, new_price):
     """Update the current price for a watchlist item"""
-    conn = sqlite3.connect(DB_NAME)
-    c = conn.cursor()
-    c.execute('UPDATE watchlist SET current_price = ? WHERE product_id = ?', (new_price, product_id))
-    conn.commit()
-    conn.close()
+    conn = get_connection()
+    with conn:
+        conn.execute('UPDATE watchlist SET current_price = ? WHERE product_id = ?', (new_price, product_id))
+
+def apply_price_updates(updates):
+    """Write refreshed watchlist prices in one transaction.
+
+    updates is an iterable of (product_id, new_price). Only items whose price
+    actually changed are updated and get a price history row. Returns the
+    number of items that changed.
+    """
+    conn = get_connection()
+    changed = 0
+    with conn:
+        for product_id, new_price in updates:
+            c = conn.execute('''UPDATE watchlist SET current_price = ?
+                                WHERE product_id = ? AND current_price != ?''',
+                             (new_price, product_id, new_price))
+            if c.rowcount:
+                product_name, marketplace = conn.execute(
+                    'SELECT product_name, marketplace FROM watchlist WHERE product_id = ?', (product_id,)
+                ).fetchone()
+                _record_price_point(conn, product_id, product_name, marketplace, new_price)
+                changed += 1
+    return changed
 
 def upvote_deal(deal_id):
     """Upvote a community deal"""
-    conn = sqlite3.connect(DB_NAME)
-    c = conn.cursor()
-    
-    # Check if deal already has upvotes
-    c.execute('SELECT upvotes FROM deal_upvotes WHERE deal_id = ?', (deal_id,))
-    result = c.fetchone()
-    
-    if result:
-        c.execute('UPDATE deal_upvotes SET upvotes = upvotes + 1 WHERE deal_id = ?', (deal_id,))
-    else:
-        c.execute('INSERT INTO deal_upvotes (deal_id, upvotes) VALUES (?, 1)', (deal_id,))
-    
-    conn.commit()
-    conn.close()
+    conn = get_connection()
+    with conn:
+        conn.execute('''INSERT INTO deal_upvotes (deal_id, upvotes) VALUES (?, 1)
+                        ON CONFLICT(deal_id) DO UPDATE SET upvotes = upvotes + 1''', (deal_id,))
 
 def get_deal_upvotes(deal_id):
     """Get upvote count for a deal"""
-    conn = sqlite3.connect(DB_NAME)
-    c = conn.cursor()
-    c.execute('SELECT upvotes FROM deal_upvotes WHERE deal_id = ?', (deal_id,))
+    conn = get_connection()
+    c = conn.execute('SELECT upvotes FROM deal_upvotes WHERE deal_id = ?', (deal_id,))
     result = c.fetchone()
-    conn.close()
     return result[0] if result else 0
+
+def get_all_deal_upvotes():
+    """Get local upvote counts for all deals as a dict of deal_id -> upvotes"""
+    conn = get_connection()
+    c = conn.execute('SELECT deal_id, upvotes FROM deal_upvotes')
+    return dict(c.fetchall())
+
+def get_image_validation(url, valid_ttl, invalid_ttl):
+    """Get the cached validation result for an image URL, or None if missing or expired.
+
+    Valid results expire after valid_ttl seconds. Invalid results expire after
+    invalid_ttl seconds per consecutive failure, capped at valid_ttl.
+    """
+    conn = get_connection()
+    c = conn.execute('''SELECT valid FROM image_validation
+                        WHERE url = ?
+                        AND checked_at > datetime('now', '-' || CASE
+                            WHEN valid THEN ?
+                            ELSE MIN(? * MAX(failure_count, 1), ?)
+                        END || ' seconds')''',
+                     (url, valid_ttl, invalid_ttl, valid_ttl))
+    result = c.fetchone()
+    return bool(result[0]) if result else None
+
+def record_image_validation(url, valid, content_type=None):
+    """Store the validation result for an image URL"""
+    conn = get_connection()
+    with conn:
+        conn.execute('''INSERT INTO image_validation (url, valid, content_type, checked_at, failure_count)
+                        VALUES (?, ?, ?, CURRENT_TIMESTAMP, ?)
+                        ON CONFLICT(url) DO UPDATE SET
+                            valid = excluded.valid,
+                            content_type = excluded.content_type,
+                            checked_at = excluded.checked_at,
+                            failure_count = CASE WHEN excluded.valid THEN 0 ELSE failure_count + 1 END''',
+                     (url, int(valid), content_type, 0 if valid else 1))
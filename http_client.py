@@ -0,0 +1,239 @@
+"""Shared client for outbound HTTP: pooled keep-alive connections, retries
+with backoff, per-host rate limits, concurrency caps and timing metrics,
+and a circuit breaker per host"""
+import threading
+import time
+from contextlib import contextmanager
+from urllib.parse import urlparse
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from circuit_breaker import CircuitBreaker, CircuitOpenError
+
+# Keep-alive connections kept per host, and hosts kept pooled
+POOL_SIZE = 16
+
+# Retries for connection errors and these statuses, waiting
+# BACKOFF_FACTOR * 2 ** (retry - 1) seconds between attempts
+MAX_RETRIES = 2
+BACKOFF_FACTOR = 0.3
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+
+# Per-host defaults: sustained requests per second, burst size, and most
+# requests in flight at once
+DEFAULT_RATE = 5.0
+DEFAULT_BURST = 10
+DEFAULT_CONCURRENCY = 4
+
+class RateLimitExceeded(requests.RequestException):
+    """A request could not start within its timeout because its host is at its limit"""
+
+class TokenBucket:
+    """Allows rate requests per second on average, in bursts of up to capacity"""
+
+    def __init__(self, rate, capacity):
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def reserve(self, timeout=None):
+        """Take a token, returning how long to wait before using it.
+
+        Returns None, taking nothing, if that wait would exceed timeout.
+        """
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            wait = max(0.0, (1 - self._tokens) / self.rate)
+            if timeout is not None and wait > timeout:
+                return None
+            self._tokens -= 1
+            return wait
+
+class HostLimiter:
+    """Rate limit, concurrency cap and timing counters for one host"""
+
+    def __init__(self, rate, burst, concurrency):
+        self.bucket = TokenBucket(rate, burst)
+        self.concurrency = concurrency
+        self._slots = threading.BoundedSemaphore(concurrency)
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.failures = 0
+        self.throttled = 0
+        self.rejected = 0
+        self.in_flight = 0
+        self.wait_time = 0.0
+        self.total_time = 0.0
+        self.max_time = 0.0
+
+    def acquire(self, timeout=None):
+        """Wait for a token and a free slot. Raises RateLimitExceeded after timeout."""
+        start = time.monotonic()
+        wait = self.bucket.reserve(timeout)
+        if wait is None:
+            with self._lock:
+                self.rejected += 1
+            raise RateLimitExceeded('Rate limit reached')
+        if wait:
+            time.sleep(wait)
+
+        remaining = None if timeout is None else max(timeout - (time.monotonic() - start), 0)
+        if not self._slots.acquire(timeout=remaining):
+            with self._lock:
+                self.rejected += 1
+            raise RateLimitExceeded('Too many requests in flight')
+
+        waited = time.monotonic() - start
+        with self._lock:
+            self.in_flight += 1
+            self.wait_time += waited
+            if waited > 0.001:
+                self.throttled += 1
+
+    def release(self, elapsed, failed):
+        """Free the slot taken by acquire() and record the request"""
+        self._slots.release()
+        with self._lock:
+            self.in_flight -= 1
+            self.requests += 1
+            self.failures += failed
+            self.total_time += elapsed
+            self.max_time = max(self.max_time, elapsed)
+
+    def stats(self):
+        with self._lock:
+            return {
+                'requests': self.requests,
+                'failures': self.failures,
+                'throttled': self.throttled,
+                'rejected': self.rejected,
+                'in_flight': self.in_flight,
+                'avg_time': round(self.total_time / self.requests, 4) if self.requests else None,
+                'max_time': round(self.max_time, 4),
+                'avg_wait': round(self.wait_time / (self.requests + self.in_flight), 4) if self.requests + self.in_flight else None,
+                'rate': self.bucket.rate,
+                'burst': self.bucket.capacity,
+                'concurrency': self.concurrency
+            }
+
+class HttpClient:
+    """requests.Session wrapper that applies per-host limits to every request.
+
+    Requests to one host share its token bucket and concurrency cap; a
+    request that cannot start within its timeout raises RateLimitExceeded.
+    It is a requests.RequestException, but nothing was sent, so callers
+    that record outcomes should re-raise it rather than record a failure.
+    While a host's circuit breaker is open, requests to it raise
+    CircuitOpenError at once instead of waiting to time out.
+    """
+
+    def __init__(self, pool_size=POOL_SIZE, retries=MAX_RETRIES, backoff=BACKOFF_FACTOR,
+                 rate=DEFAULT_RATE, burst=DEFAULT_BURST, concurrency=DEFAULT_CONCURRENCY):
+        self.session = requests.Session()
+        retry = Retry(total=retries, backoff_factor=backoff, status_forcelist=RETRY_STATUSES,
+                      allowed_methods=frozenset({'GET', 'HEAD'}), raise_on_status=False)
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=retry)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+        self.defaults = (rate, burst, concurrency)
+        self._limiters = {}
+        self._breakers = {}
+        self._lock = threading.Lock()
+
+    def set_host_limit(self, host, rate=None, burst=None, concurrency=None):
+        """Override the rate, burst or concurrency limit for one host"""
+        default_rate, default_burst, default_concurrency = self.defaults
+        with self._lock:
+            self._limiters[host] = HostLimiter(rate or default_rate, burst or default_burst,
+                                               concurrency or default_concurrency)
+
+    def limiter(self, host):
+        """Get the limiter for host, creating it with the defaults"""
+        with self._lock:
+            limiter = self._limiters.get(host)
+            if limiter is None:
+                limiter = self._limiters[host] = HostLimiter(*self.defaults)
+            return limiter
+
+    def breaker(self, host):
+        """Get the circuit breaker for host"""
+        with self._lock:
+            breaker = self._breakers.get(host)
+            if breaker is None:
+                breaker = self._breakers[host] = CircuitBreaker(host)
+            return breaker
+
+    @contextmanager
+    def limited(self, host, timeout=None):
+        """Run the block as one request to host, under its limits, metrics and breaker.
+
+        Also for clients with their own transport. Yields a dict; an
+        exception, or setting outcome['failed'] = True, counts a failure.
+        """
+        breaker = self.breaker(host)
+        if not breaker.allow():
+            raise CircuitOpenError(f"{host} is unavailable")
+        limiter = self.limiter(host)
+        try:
+            limiter.acquire(timeout)
+        except RateLimitExceeded:
+            breaker.cancel()
+            raise
+        outcome = {'failed': False}
+        start = time.monotonic()
+        try:
+            yield outcome
+        except BaseException:
+            outcome['failed'] = True
+            raise
+        finally:
+            limiter.release(time.monotonic() - start, outcome['failed'])
+            breaker.record(not outcome['failed'])
+
+    def request(self, method, url, timeout=5, **kwargs):
+        """Send a request through the pool. timeout also bounds the wait for a slot."""
+        with self.limited(urlparse(url).netloc, timeout) as outcome:
+            response = self.session.request(method, url, timeout=timeout, **kwargs)
+            outcome['failed'] = response.status_code >= 500
+        return response
+
+    def get(self, url, **kwargs):
+        kwargs.setdefault('allow_redirects', True)
+        return self.request('GET', url, **kwargs)
+
+    def head(self, url, **kwargs):
+        return self.request('HEAD', url, **kwargs)
+
+    @contextmanager
+    def stream(self, url, timeout=5, **kwargs):
+        """GET url with stream=True, yielding the response.
+
+        The host's slot stays taken, and the request counts towards its
+        breaker, until the block has finished reading the body.
+        """
+        kwargs.setdefault('allow_redirects', True)
+        with self.limited(urlparse(url).netloc, timeout) as outcome:
+            with self.session.request('GET', url, timeout=timeout, stream=True, **kwargs) as response:
+                outcome['failed'] = response.status_code >= 500
+                yield response
+
+    def stats(self):
+        """Get per-host counters and timings"""
+        with self._lock:
+            limiters = dict(self._limiters)
+        return {host: limiter.stats() for host, limiter in sorted(limiters.items())}
+
+    def breaker_stats(self):
+        """Get each host's circuit breaker state"""
+        with self._lock:
+            breakers = dict(self._breakers)
+        return {host: breaker.stats() for host, breaker in sorted(breakers.items())}
+
+# Shared by everything in the app that calls out over HTTP
+client = HttpClient()
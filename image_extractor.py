@@ -0,0 +1,225 @@
+"""Find a product page's main image without parsing the whole page.
+
+extract_image() feeds the page to an event-based parser chunk by chunk as
+it downloads, and stops as soon as the best possible tag for the site has
+been seen, or after MAX_SCAN_BYTES. It picks the same tag
+extract_image_soup() would pick from the same bytes. BeautifulSoup is
+only used if the streaming parser fails.
+"""
+import codecs
+import re
+from html.parser import HTMLParser
+
+import requests
+from bs4 import BeautifulSoup
+
+# Most bytes of a page read while looking for an image. og:image is
+# normally in <head>; site-specific tags can sit further into <body>.
+MAX_SCAN_BYTES = 1024 * 1024
+
+CHUNK_SIZE = 16 * 1024
+
+# Only the first this many <img> tags are considered for the alt-text fallback
+ALT_SCAN_LIMIT = 20
+
+# URL substring -> candidate kinds for that site, best first. The first kind
+# present on the page decides, as with BeautifulSoup's find(...) or find(...).
+SITE_RULES = {
+    'amazon.com': ('amazon_landing', 'amazon_dynamic', 'amazon_hires'),
+    'ebay.com': ('ebay_main', 'ebay_gallery'),
+    'aliexpress.com': ('aliexpress_magnifier', 'aliexpress_og'),
+}
+META_RULES = ('og_image', 'twitter_image')
+
+def site_rules(page_url):
+    """Get the site-specific candidate kinds for page_url"""
+    for domain, kinds in SITE_RULES.items():
+        if domain in page_url:
+            return kinds
+    return ()
+
+def amazon_image(attrs):
+    """Get the image URL from an Amazon image tag's attributes"""
+    image_url = attrs.get('src') or attrs.get('data-old-hires') or attrs.get('data-a-dynamic-image')
+    if image_url and image_url.startswith('data:'):
+        # Extract from data-a-dynamic-image JSON
+        dynamic_img = attrs.get('data-a-dynamic-image')
+        if dynamic_img:
+            urls = re.findall(r'"(https?://[^"]+)"', dynamic_img)
+            if urls:
+                image_url = urls[0]
+    return image_url
+
+def alt_image(attrs):
+    """Get the image URL of an <img> whose alt text suggests a product image, or None"""
+    alt = (attrs.get('alt') or '').lower()
+    src = attrs.get('src') or attrs.get('data-src')
+    if src and ('product' in alt or 'item' in alt or len(alt) > 10):
+        if not src.startswith('data:') and ('http' in src or src.startswith('//')):
+            return src
+    return None
+
+class ImageTagParser(HTMLParser):
+    """Records the first image candidate of each kind as tags stream past.
+
+    done is set once the best kind for the site has been seen, after which
+    nothing later in the page can change the result.
+    """
+
+    def __init__(self, page_url):
+        super().__init__()
+        self.rules = site_rules(page_url)
+        self.candidates = {}
+        self.alt_candidate = None
+        self.images_seen = 0
+        self.done = False
+
+    def _add(self, kind, value):
+        if kind in self.candidates:
+            return
+        self.candidates[kind] = value
+        if value and kind == (self.rules or META_RULES)[0]:
+            self.done = True
+
+    def handle_starttag(self, tag, attr_list):
+        attrs = {name: value or '' for name, value in attr_list}
+        if tag == 'img':
+            classes = attrs.get('class', '').split()
+            if 'amazon_landing' in self.rules:
+                if attrs.get('id') == 'landingImage':
+                    self._add('amazon_landing', amazon_image(attrs))
+                if 'a-dynamic-image' in classes:
+                    self._add('amazon_dynamic', amazon_image(attrs))
+                if 'data-old-hires' in attrs:
+                    self._add('amazon_hires', amazon_image(attrs))
+            elif 'ebay_main' in self.rules:
+                if attrs.get('id') == 'icImg':
+                    self._add('ebay_main', attrs.get('src'))
+                if 'vi-image-gallery__image' in classes:
+                    self._add('ebay_gallery', attrs.get('src'))
+            elif 'aliexpress_magnifier' in self.rules and 'magnifier-image' in classes:
+                self._add('aliexpress_magnifier', attrs.get('src'))
+
+            if self.images_seen < ALT_SCAN_LIMIT:
+                self.images_seen += 1
+                if self.alt_candidate is None:
+                    self.alt_candidate = alt_image(attrs)
+        elif tag == 'meta':
+            if attrs.get('property') == 'og:image':
+                if 'aliexpress_og' in self.rules:
+                    self._add('aliexpress_og', attrs.get('content'))
+                self._add('og_image', attrs.get('content'))
+            elif attrs.get('name') == 'twitter:image':
+                self._add('twitter_image', attrs.get('content'))
+
+    handle_startendtag = handle_starttag
+
+    def result(self):
+        """Get the chosen image URL from what has been seen so far, or None"""
+        for rules in (self.rules, META_RULES):
+            for kind in rules:
+                if kind in self.candidates:
+                    if self.candidates[kind]:
+                        return self.candidates[kind]
+                    break
+        return self.alt_candidate
+
+def extract_image_streaming(chunks, page_url, encoding='utf-8', max_bytes=MAX_SCAN_BYTES):
+    """Find the image URL in a page given as an iterable of byte chunks.
+
+    Returns (image_url or None, bytes read). Stops reading once the result
+    is settled or max_bytes have been read.
+    """
+    parser = ImageTagParser(page_url)
+    decoder = codecs.getincrementaldecoder(encoding)(errors='replace')
+    read = 0
+    for chunk in chunks:
+        chunk = chunk[:max_bytes - read]
+        read += len(chunk)
+        parser.feed(decoder.decode(chunk))
+        if parser.done or read >= max_bytes:
+            break
+    return parser.result(), read
+
+def extract_image_soup(html, page_url):
+    """Find the image URL by building a full BeautifulSoup tree. The fallback."""
+    soup = BeautifulSoup(html, 'html.parser')
+    image_url = None
+
+    # Amazon specific
+    if 'amazon.com' in page_url:
+        img_tag = soup.find('img', {'id': 'landingImage'}) or \
+                 soup.find('img', {'class': 'a-dynamic-image'}) or \
+                 soup.find('img', {'data-old-hires': True})
+        if img_tag:
+            image_url = amazon_image(img_tag.attrs)
+
+    # eBay specific
+    elif 'ebay.com' in page_url:
+        img_tag = soup.find('img', {'id': 'icImg'}) or \
+                 soup.find('img', {'class': 'vi-image-gallery__image'})
+        if img_tag:
+            image_url = img_tag.get('src')
+
+    # AliExpress specific
+    elif 'aliexpress.com' in page_url:
+        img_tag = soup.find('img', {'class': 'magnifier-image'}) or \
+                 soup.find('meta', {'property': 'og:image'})
+        if img_tag:
+            image_url = img_tag.get('src') if img_tag.name == 'img' else img_tag.get('content')
+
+    # Generic Open Graph image
+    if not image_url:
+        meta_tag = soup.find('meta', {'property': 'og:image'}) or \
+                  soup.find('meta', {'name': 'twitter:image'})
+        if meta_tag:
+            image_url = meta_tag.get('content')
+
+    # Generic image with product in alt text
+    if not image_url:
+        for img in soup.find_all('img', limit=ALT_SCAN_LIMIT):
+            image_url = alt_image(img.attrs)
+            if image_url:
+                break
+
+    return image_url
+
+def extract_image(response, page_url, max_bytes=MAX_SCAN_BYTES):
+    """Find the image URL in a streamed requests response (stream=True).
+
+    Falls back to BeautifulSoup over the first max_bytes of the page if the
+    streaming parser fails. Network errors while reading are raised.
+    """
+    # requests assumes ISO-8859-1 when no charset is given; pages are
+    # almost always UTF-8 then
+    encoding = 'utf-8'
+    if 'charset' in response.headers.get('content-type', '').lower() and response.encoding:
+        encoding = response.encoding
+    try:
+        codecs.lookup(encoding)
+    except LookupError:
+        encoding = 'utf-8'
+
+    received = []
+
+    def chunks():
+        for chunk in response.iter_content(chunk_size=CHUNK_SIZE):
+            received.append(chunk)
+            yield chunk
+
+    body = chunks()
+    try:
+        image_url, _ = extract_image_streaming(body, page_url, encoding, max_bytes)
+        return image_url
+    except requests.RequestException:
+        # Part of a page is not worth guessing from
+        raise
+    except Exception:
+        # The parser failed; read on up to max_bytes for BeautifulSoup
+        read = sum(len(chunk) for chunk in received)
+        while read < max_bytes:
+            chunk = next(body, None)
+            if chunk is None:
+                break
+            read += len(chunk)
+        return extract_image_soup(b''.join(received)[:max_bytes], page_url)
@@ -0,0 +1,141 @@
+import queue
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future, wait
+
+
+class ImageResolver:
+    """Resolves product images on daemon worker threads into an in-memory store.
+
+    lookup() never touches the network: it returns the resolved image if one is
+    stored, otherwise schedules resolution and returns None so the caller can
+    use a placeholder. resolve_many() waits for a batch, up to a deadline.
+
+    At most max_pending images wait to be resolved; past that, new ones are
+    not scheduled and get a placeholder until a later lookup. Daemon workers
+    don't hold up interpreter exit, so queued checks are dropped on restart.
+
+    The store keeps at most maxsize images, least recently used out first.
+    Images expire after ttl seconds, or fallback_ttl for results that
+    is_fallback() says are placeholders, so a failed check is retried.
+    """
+
+    def __init__(self, resolve, workers=8, maxsize=10000, ttl=None, fallback_ttl=None, is_fallback=None,
+                 max_pending=1000):
+        self._resolve = resolve
+        self._workers = workers
+        self._threads = []
+        self._queue = queue.Queue(max_pending)
+        self.rejected = 0
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.fallback_ttl = fallback_ttl
+        self._is_fallback = is_fallback
+        # key -> (expiry time or None, resolved image), oldest use first
+        self._store = OrderedDict()
+        self._pending = {}
+        self._clear_listeners = []
+        self._lock = threading.Lock()
+
+    def _start(self):
+        """Start the worker threads on first use"""
+        for _ in range(self._workers):
+            thread = threading.Thread(target=self._work, name='image-resolver', daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def _work(self):
+        while True:
+            key, future = self._queue.get()
+            future.set_result(self._run(key))
+
+    def _run(self, key):
+        image_url, name, product_url = key
+        try:
+            resolved = self._resolve(image_url, name, product_url)
+        except Exception:
+            resolved = None
+
+        ttl = self.ttl
+        if resolved and self._is_fallback is not None and self._is_fallback(resolved):
+            ttl = self.fallback_ttl
+        expires = time.monotonic() + ttl if ttl is not None else None
+
+        with self._lock:
+            self._pending.pop(key, None)
+            if resolved:
+                self._store[key] = (expires, resolved)
+                self._store.move_to_end(key)
+                while len(self._store) > self.maxsize:
+                    self._store.popitem(last=False)
+        return resolved
+
+    def _schedule(self, key):
+        """Get the stored image for key, or the future resolving it.
+
+        The future is None too if the queue is full. Caller holds the lock.
+        """
+        entry = self._store.get(key)
+        if entry is not None:
+            expires, resolved = entry
+            if expires is None or expires > time.monotonic():
+                self._store.move_to_end(key)
+                return resolved, None
+            del self._store[key]
+        future = self._pending.get(key)
+        if future is None:
+            future = Future()
+            try:
+                self._queue.put_nowait((key, future))
+            except queue.Full:
+                self.rejected += 1
+                return None, None
+            self._pending[key] = future
+            if not self._threads:
+                self._start()
+        return None, future
+
+    def lookup(self, image_url, name, product_url=None):
+        """Get the resolved image, or None and schedule resolution"""
+        key = (image_url or '', name, product_url or '')
+        with self._lock:
+            resolved, _ = self._schedule(key)
+        return resolved
+
+    def resolve_many(self, items, timeout):
+        """Resolve (image_url, name, product_url) items concurrently.
+
+        Returns a list with the resolved image for each item, or None for items
+        not resolved within timeout seconds. Those keep resolving in the
+        background and are stored when they finish.
+        """
+        keys = [(image_url or '', name, product_url or '') for image_url, name, product_url in items]
+        results = [None] * len(keys)
+        futures = {}
+        with self._lock:
+            for i, key in enumerate(keys):
+                results[i], future = self._schedule(key)
+                if future is not None:
+                    futures[i] = future
+
+        if futures:
+            wait(set(futures.values()), timeout=timeout)
+            for i, future in futures.items():
+                if future.done():
+                    results[i] = future.result()
+        return results
+
+    def on_clear(self, callback):
+        """Call callback() whenever the store is cleared"""
+        self._clear_listeners.append(callback)
+
+    def clear(self):
+        """Forget all resolved images"""
+        with self._lock:
+            self._store.clear()
+        for callback in self._clear_listeners:
+            callback()
+
+    def __len__(self):
+        return len(self._store)
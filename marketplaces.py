@@ -0,0 +1,118 @@
+"""Marketplace adapters and a fan-out search across them"""
+import time
+from abc import ABC, abstractmethod
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+import mock_data
+from catalog import tokenize
+from products import Marketplace, ProductView
+
+# Seconds each marketplace gets to answer a search by default
+DEFAULT_TIMEOUT = 2.0
+
+DEFAULT_WORKERS = 16
+
+class MarketplaceAdapter(ABC):
+    """Searches one marketplace. Subclasses implement search()."""
+
+    def __init__(self, name, timeout=DEFAULT_TIMEOUT):
+        self.name = name
+        self.timeout = timeout
+
+    @abstractmethod
+    def search(self, query, filters, limit):
+        """Get up to limit Products or ProductViews for query, best first in filters['sort_by'] order"""
+
+class CatalogAdapter(MarketplaceAdapter):
+    """Searches one marketplace's products in the mock catalog"""
+
+    def search(self, query, filters, limit):
+        catalog = mock_data.get_catalog()
+        positions = catalog.filter(
+            catalog.match(query),
+            free_shipping=filters.get('free_shipping'),
+            discount_only=filters.get('discount_only'),
+            marketplace=self.name
+        )
+        positions = catalog.top_k(positions, filters.get('sort_by', 'relevance'), limit, query=query)
+        return [ProductView(catalog.products[i]) for i in positions.tolist()]
+
+class StubAdapter(MarketplaceAdapter):
+    """Fixed Products with an optional delay per search. For tests.
+
+    Returns the products whose name contains every query term, in the
+    order given, after sleeping delay seconds. Set error to make every
+    search raise it.
+    """
+
+    def __init__(self, name, products=(), delay=0, timeout=DEFAULT_TIMEOUT, error=None):
+        super().__init__(name, timeout)
+        self.products = list(products)
+        self.delay = delay
+        self.error = error
+        self.calls = []
+
+    def search(self, query, filters, limit):
+        self.calls.append(query)
+        if self.delay:
+            time.sleep(self.delay)
+        if self.error is not None:
+            raise self.error
+        terms = tokenize(query)
+        return [ProductView(product) for product in self.products
+                if all(term in product.name.lower() for term in terms)][:limit]
+
+# marketplace name -> adapter
+_adapters = {}
+
+def register_adapter(adapter):
+    """Search adapter.name with adapter, replacing any previous one"""
+    _adapters[adapter.name] = adapter
+
+def get_adapters(marketplaces=None):
+    """Get the adapters for marketplaces (names), or all of them"""
+    if marketplaces is None:
+        return list(_adapters.values())
+    return [_adapters[name] for name in marketplaces if name in _adapters]
+
+for marketplace in Marketplace:
+    register_adapter(CatalogAdapter(marketplace.value))
+
+_executor = ThreadPoolExecutor(max_workers=DEFAULT_WORKERS, thread_name_prefix='marketplace-search')
+
+def fan_out(query, filters=None, limit=50, marketplaces=None):
+    """Search marketplaces concurrently and yield each one's result as it arrives.
+
+    Yields (name, products, status) tuples, status being a dict with
+    'status' ('ok', 'timeout' or 'error'), 'count' and 'elapsed' seconds.
+    Each adapter is given up to its own timeout; one that misses it is
+    reported as 'timeout' with no products and keeps running in the
+    background, so slow marketplaces don't hold up the others.
+    """
+    filters = filters or {}
+    adapters = get_adapters(marketplaces)
+    start = time.monotonic()
+    pending = {
+        _executor.submit(adapter.search, query, filters, limit): (adapter, start + adapter.timeout)
+        for adapter in adapters
+    }
+
+    while pending:
+        next_deadline = min(deadline for _, deadline in pending.values())
+        done, _ = wait(pending, timeout=max(next_deadline - time.monotonic(), 0), return_when=FIRST_COMPLETED)
+        now = time.monotonic()
+
+        for future in done:
+            adapter, _ = pending.pop(future)
+            elapsed = round(now - start, 3)
+            try:
+                products = future.result()
+            except Exception as e:
+                yield adapter.name, [], {'status': 'error', 'count': 0, 'elapsed': elapsed, 'error': str(e)}
+                continue
+            yield adapter.name, products, {'status': 'ok', 'count': len(products), 'elapsed': elapsed}
+
+        for future, (adapter, deadline) in list(pending.items()):
+            if deadline <= now:
+                del pending[future]
+                yield adapter.name, [], {'status': 'timeout', 'count': 0, 'elapsed': round(now - start, 3)}
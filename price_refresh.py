@@ -0,0 +1,158 @@
+"""Scheduled refresh of current prices for everything in the watchlist"""
+import argparse
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlparse
+
+import database
+import mock_data
+
+# Refresh once a day by default
+DEFAULT_INTERVAL = 24 * 3600
+
+DEFAULT_WORKERS = 8
+
+# Most requests in flight to any one domain at a time
+PER_DOMAIN_LIMIT = 2
+
+# Only the process holding this lock runs the refresh loop, so several app
+# workers (or the debug reloader) don't each refresh the whole watchlist
+SCHEDULER_LOCK = os.environ.get('PRICE_REFRESH_LOCK', 'price-refresh.lock')
+
+WATCHLIST_COLUMNS = ('id', 'product_id', 'product_name', 'marketplace', 'current_price',
+                     'original_price', 'image_url', 'product_url', 'added_date')
+
+# marketplace -> callable taking a watchlist item dict and returning its
+# current price, or None if it could not be found
+_fetchers = {}
+
+def register_fetcher(marketplace, fetcher):
+    """Use fetcher for items from marketplace. A marketplace of None sets the default."""
+    _fetchers[marketplace] = fetcher
+
+def get_fetcher(marketplace):
+    """Get the fetcher for a marketplace, falling back to the default"""
+    return _fetchers.get(marketplace) or _fetchers.get(None)
+
+def catalog_price(item):
+    """Fetch the current price from the mock marketplace catalog"""
+    product = mock_data.get_catalog().get(item['product_id'])
+    return product['price'] if product else None
+
+class StubPriceSource:
+    """Fixed prices keyed by product ID, with an optional delay per fetch. For tests."""
+
+    def __init__(self, prices, delay=0):
+        self.prices = dict(prices)
+        self.delay = delay
+        self.calls = []
+
+    def __call__(self, item):
+        self.calls.append(item['product_id'])
+        if self.delay:
+            time.sleep(self.delay)
+        return self.prices.get(item['product_id'])
+
+register_fetcher(None, catalog_price)
+
+def item_domain(item):
+    """Get the domain a watchlist item's price is fetched from"""
+    netloc = urlparse(item.get('product_url') or '').netloc
+    return netloc or item['marketplace']
+
+def refresh_watchlist(workers=DEFAULT_WORKERS, per_domain=PER_DOMAIN_LIMIT):
+    """Fetch current prices for all watchlist items and store any changes.
+
+    Returns a dict with the number of items checked, changed and failed.
+    """
+    items = [dict(zip(WATCHLIST_COLUMNS, row)) for row in database.get_watchlist()]
+
+    semaphores = {}
+    for item in items:
+        semaphores.setdefault(item_domain(item), threading.Semaphore(per_domain))
+
+    def fetch(item):
+        fetcher = get_fetcher(item['marketplace'])
+        if fetcher is None:
+            return None
+        with semaphores[item_domain(item)]:
+            try:
+                return fetcher(item)
+            except Exception:
+                return None
+
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='price-refresh') as executor:
+        prices = list(executor.map(fetch, items))
+
+    updates = [(item['product_id'], price) for item, price in zip(items, prices) if price is not None]
+    changed = database.apply_price_updates(updates)
+
+    return {
+        'checked': len(items),
+        'changed': changed,
+        'failed': len(items) - len(updates)
+    }
+
+# Open lock file while this process holds the scheduler lock
+_lock_file = None
+
+def acquire_scheduler_lock(path=SCHEDULER_LOCK):
+    """Take the scheduler lock for this process's lifetime. False if another process has it."""
+    global _lock_file
+    if _lock_file is not None:
+        return True
+    try:
+        import fcntl
+    except ImportError:
+        # No flock on this platform; run unguarded
+        return True
+    lock_file = open(path, 'a')
+    try:
+        fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except OSError:
+        lock_file.close()
+        return False
+    _lock_file = lock_file
+    return True
+
+def run_forever(interval=DEFAULT_INTERVAL, workers=DEFAULT_WORKERS):
+    """Refresh the watchlist every interval seconds"""
+    while True:
+        try:
+            refresh_watchlist(workers=workers)
+        except Exception as e:
+            print(f"Price refresh failed: {e}")
+        time.sleep(interval)
+
+def start_background(interval=DEFAULT_INTERVAL, workers=DEFAULT_WORKERS):
+    """Run the refresh loop on a daemon thread alongside the app.
+
+    Returns None without starting it if another process already runs one.
+    """
+    if not acquire_scheduler_lock():
+        return None
+    thread = threading.Thread(target=run_forever, args=(interval, workers),
+                              name='price-refresh-scheduler', daemon=True)
+    thread.start()
+    return thread
+
+def main():
+    parser = argparse.ArgumentParser(description='Refresh watchlist prices')
+    parser.add_argument('--once', action='store_true', help='refresh once and exit')
+    parser.add_argument('--interval', type=int, default=DEFAULT_INTERVAL, help='seconds between refreshes')
+    parser.add_argument('--workers', type=int, default=DEFAULT_WORKERS, help='concurrent fetches')
+    args = parser.parse_args()
+
+    database.init_db()
+    if args.once:
+        result = refresh_watchlist(workers=args.workers)
+        print(f"Checked {result['checked']}, changed {result['changed']}, failed {result['failed']}")
+    elif not acquire_scheduler_lock():
+        print("Another process is already refreshing prices on a schedule")
+    else:
+        run_forever(args.interval, args.workers)
+
+if __name__ == '__main__':
+    main()
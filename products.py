@@ -0,0 +1,105 @@
+from enum import StrEnum
+from typing import NamedTuple
+
+
+class Marketplace(StrEnum):
+    """Marketplaces products come from. Members are str, so they render and
+    compare as their names ('Amazon' == Marketplace.AMAZON)."""
+
+    AMAZON = 'Amazon'
+    EBAY = 'eBay'
+    ALIEXPRESS = 'AliExpress'
+    TEMU = 'Temu'
+    JUMIA = 'Jumia'
+
+
+# Name -> member, a faster lookup than Marketplace(name) when loading
+MARKETPLACES = {marketplace.value: marketplace for marketplace in Marketplace}
+
+
+class Product(NamedTuple):
+    """One catalog product. Immutable and shared by every request.
+
+    Supports product['name'] and product.get('name') as well as attribute
+    access, so code written against product dicts keeps working.
+    """
+
+    id: str
+    name: str
+    marketplace: Marketplace
+    price: float
+    original_price: float = None
+    discount: int = 0
+    image: str = ''
+    url: str = ''
+    free_shipping: bool = False
+    rating: float = 0.0
+    reviews: int = 0
+    delivery_days: int = 0
+    description: str = ''
+
+    @classmethod
+    def from_dict(cls, record):
+        """Make a Product from a catalog record dict"""
+        return cls(**{**record, 'marketplace': MARKETPLACES[record['marketplace']]})
+
+    def __getitem__(self, key):
+        if not isinstance(key, str):
+            return tuple.__getitem__(self, key)
+        # Only fields, not tuple methods such as count or index
+        if key not in PRODUCT_FIELDS:
+            raise KeyError(key)
+        return getattr(self, key)
+
+    def get(self, key, default=None):
+        if key not in PRODUCT_FIELDS:
+            return default
+        return getattr(self, key)
+
+    def to_dict(self):
+        """Get the product as a plain dict, e.g. for JSON"""
+        return self._asdict()
+
+
+PRODUCT_FIELDS = frozenset(Product._fields)
+
+
+class ProductView:
+    """A Product with per-request values layered on top, such as the
+    resolved image or in_watchlist.
+
+    Reads check the overlay first, then the product; writes only touch the
+    overlay, so the shared Product is never copied or changed.
+    """
+
+    __slots__ = ('product', 'overlay')
+
+    def __init__(self, product, **overlay):
+        self.product = product
+        self.overlay = overlay
+
+    def __getattr__(self, name):
+        overlay = object.__getattribute__(self, 'overlay')
+        if name in overlay:
+            return overlay[name]
+        return getattr(object.__getattribute__(self, 'product'), name)
+
+    def __getitem__(self, key):
+        if key in self.overlay:
+            return self.overlay[key]
+        return self.product[key]
+
+    def __setitem__(self, key, value):
+        self.overlay[key] = value
+
+    def __contains__(self, key):
+        return key in self.overlay or key in PRODUCT_FIELDS
+
+    def get(self, key, default=None):
+        if key in self.overlay:
+            return self.overlay[key]
+        return self.product.get(key, default)
+
+    def to_dict(self):
+        """Get the product with its overlay as a plain dict, e.g. for JSON"""
+        return {**self.product.to_dict(), **self.overlay}
@@ -0,0 +1,230 @@
+import heapq
+import itertools
+from bisect import bisect_left
+from collections import Counter
+from itertools import groupby, islice
+
+import numpy as np
+
+
+def trigrams(text):
+    """Get the set of character trigrams of text, each word padded like '  word '"""
+    grams = set()
+    for word in text.lower().split():
+        padded = f"  {word} "
+        for i in range(len(padded) - 2):
+            grams.add(padded[i:i + 3])
+    return grams
+
+
+class SuggestIndex:
+    """Word index over product names for typo-tolerant suggestions.
+
+    Built once from the catalog and never changed, so lookups take no lock;
+    a new catalog gets a new index. Each distinct name word lists its
+    products most popular first, so a lookup reads the most popular names
+    with one query word rather than every name sharing a trigram with the
+    query. Misspelled query words are swapped for indexed words sharing
+    their trigrams.
+    """
+
+    # Share of the query's trigrams a name must contain to be suggested,
+    # unless one of its words starts with the query
+    MIN_SIMILARITY = 0.5
+
+    # Most names ranked per lookup, of each kind
+    CANDIDATES = 100
+
+    # Most names read per phrase looked up, for the query itself and for
+    # each spelling-corrected version of it
+    MAX_PREFIX_SCAN = 5000
+    MAX_FUZZY_SCAN = 1000
+
+    # Indexed words tried in place of each query word, and most corrected
+    # versions of the query looked up
+    FUZZY_WORDS = 3
+    FUZZY_PHRASES = 4
+
+    # Share of all names above which names starting with a one-word query
+    # are found by reading every name in popularity order, rather than
+    # merging what may be hundreds of word lists
+    COMMON_SHARE = 0.05
+
+    def __init__(self, products=()):
+        # Position in these lists is the product's popularity rank, so
+        # ascending positions are most popular first
+        products = sorted(products, key=lambda product: (product.get('reviews', 0), product['id']), reverse=True)
+        self._ids = [product['id'] for product in products]
+        self._names = [product['name'] for product in products]
+        self._names_lower = [' '.join(name.lower().split()) for name in self._names]
+        self._popularity = [product.get('reviews', 0) for product in products]
+
+        postings = {}
+        for rank, name_lower in enumerate(self._names_lower):
+            for word in set(name_lower.split()):
+                postings.setdefault(word, []).append(rank)
+        # Sorted words and, for each, the ranks of products with it
+        self._words = sorted(postings)
+        self._postings = [np.array(postings[word], dtype=np.int32) for word in self._words]
+
+        # trigram -> ids of the words containing it
+        self._word_grams = {}
+        self._word_gram_counts = []
+        for word_id, word in enumerate(self._words):
+            grams = trigrams(word)
+            self._word_gram_counts.append(len(grams))
+            for gram in grams:
+                self._word_grams.setdefault(gram, []).append(word_id)
+
+    def _matching_words(self, word, prefix):
+        """Get the ids of indexed words equal to word, or starting with it if prefix"""
+        start = bisect_left(self._words, word)
+        if prefix:
+            return range(start, bisect_left(self._words, word + '\U0010ffff'))
+        if start < len(self._words) and self._words[start] == word:
+            return range(start, start + 1)
+        return range(0)
+
+    def _similar_words(self, word):
+        """Get the indexed words with at least MIN_SIMILARITY of word's trigrams, closest first"""
+        grams = trigrams(word)
+        shared = Counter()
+        for gram in grams:
+            shared.update(self._word_grams.get(gram, ()))
+        similar = [(common / (len(grams) + self._word_gram_counts[word_id] - common), -word_id)
+                   for word_id, common in shared.items() if common >= self.MIN_SIMILARITY * len(grams)]
+        return [self._words[-word_id] for _, word_id in heapq.nlargest(self.FUZZY_WORDS, similar)]
+
+    def _postings_size(self, word_ids):
+        return sum(len(self._postings[word_id]) for word_id in word_ids)
+
+    def _ranks(self, word_ids, count):
+        """Get the first count ranks of products with any of word_ids, most popular first"""
+        if len(word_ids) == 1:
+            return self._postings[word_ids[0]][:count].tolist()
+        merged = heapq.merge(*(self._postings[word_id][:count].tolist() for word_id in word_ids))
+        return list(islice((rank for rank, _ in groupby(merged)), count))
+
+    def _intersection(self, arrays, count):
+        """Get the first count ranks in all of arrays, most popular first"""
+        arrays = sorted(arrays, key=len)
+        found = []
+        # In slices of the rarest, as the first one usually has enough
+        for start in range(0, len(arrays[0]), count):
+            ranks = arrays[0][start:start + count]
+            for other in arrays[1:]:
+                ranks = ranks[other[np.searchsorted(other, ranks).clip(max=len(other) - 1)] == ranks]
+            found += ranks.tolist()
+            if len(found) >= count:
+                break
+        return found[:count]
+
+    def _containing(self, words, complete, limit, scan, skip=()):
+        """Get the ranks of up to limit names containing words from a word start, most popular first.
+
+        The last word must be complete, or may be the start of a word.
+        Reads at most scan names, those with all the complete words.
+        """
+        found = []
+        last = self._matching_words(words[-1], not complete)
+        full = [self._matching_words(word, False) for word in words[:-1]]
+        if limit <= 0 or not last or not all(full):
+            return found
+
+        if len(last) == 1:
+            full.append(last)
+        if full:
+            ranks = self._intersection([self._postings[word_ids[0]] for word_ids in full], scan)
+        elif self._postings_size(last) >= len(self._ids) * self.COMMON_SHARE:
+            ranks = range(min(scan, len(self._ids)))
+        else:
+            # Every name with the word matches
+            ranks = self._ranks(last, limit + len(skip))
+
+        phrase = f" {' '.join(words)}" + (' ' if complete else '')
+        for rank in ranks:
+            if rank not in skip and phrase in f" {self._names_lower[rank]} ":
+                found.append(rank)
+                if len(found) == limit:
+                    break
+        return found
+
+    def _prefixed(self, words, limit, scan, skip=()):
+        """Get the ranks of up to limit names with words at a word start.
+
+        Names where the last word is complete come first, as they contain
+        more of the query's trigrams.
+        """
+        skip = set(skip)
+        found = self._containing(words, True, limit, scan, skip)
+        skip.update(found)
+        return found + self._containing(words, False, limit - len(found), scan, skip)
+
+    def _splits(self, word, prefix):
+        """Get the ways to split word into two indexed words, e.g. 'asusultra' as ['asus', 'ultra']"""
+        return [[word[:i], word[i:]] for i in range(2, len(word) - 1)
+                if self._matching_words(word[:i], False) and self._matching_words(word[i:], prefix)]
+
+    def _corrections(self, words):
+        """Get up to FUZZY_PHRASES versions of words with misspellings fixed.
+
+        Words not in the index are split into two indexed words, swapped
+        for similar ones or, in longer queries, dropped. If every word is
+        indexed, one word at a time is, last word first.
+        """
+        last = len(words) - 1
+        unknown = {i for i, word in enumerate(words) if not self._matching_words(word, i == last)}
+
+        def options(i):
+            found = self._splits(words[i], i == last)
+            found += [[similar] for similar in self._similar_words(words[i]) if similar != words[i]]
+            if len(words) > 1:
+                found.append([])
+            return found
+
+        if unknown:
+            choices = [options(i) if i in unknown else [[word]] for i, word in enumerate(words)]
+            phrases = (sum(choice, []) for choice in itertools.product(*choices))
+        else:
+            phrases = (words[:i] + option + words[i + 1:] for i in reversed(range(len(words))) for option in options(i))
+        return list(islice((phrase for phrase in phrases if phrase), self.FUZZY_PHRASES))
+
+    def suggest(self, query, limit=8):
+        """Get up to limit suggestions for query as (product_id, name, score) tuples.
+
+        Names with a word starting with the query rank first, then names by
+        the share of the query's trigrams they contain, so misspellings still
+        match. Ties go to the product with more reviews. Only the most
+        popular CANDIDATES names of each kind are ranked.
+        """
+        query_lower = ' '.join(query.lower().split())
+        query_grams = trigrams(query_lower)
+        if not query_grams:
+            return []
+        words = query_lower.split()
+
+        # A name containing the query from a word start has all its
+        # trigrams, but perhaps not the one ending its last word
+        last_gram = f"  {words[-1]} "[-3:]
+        prefixed = self._prefixed(words, self.CANDIDATES, self.MAX_PREFIX_SCAN)
+        ranked = []
+        for rank in prefixed:
+            similarity = (len(query_grams) - 1 + (last_gram in f" {self._names_lower[rank]} ")) / len(query_grams)
+            ranked.append((True, similarity, self._popularity[rank], self._ids[rank], self._names[rank]))
+
+        if len(prefixed) < limit:
+            # Misspelled matches: names starting with a corrected query
+            seen = set(prefixed)
+            for phrase in self._corrections(words):
+                found = self._prefixed(phrase, self.CANDIDATES - len(seen) + len(prefixed), self.MAX_FUZZY_SCAN, seen)
+                seen.update(found)
+                for rank in found:
+                    similarity = len(query_grams & trigrams(self._names_lower[rank])) / len(query_grams)
+                    if similarity >= self.MIN_SIMILARITY:
+                        ranked.append((False, similarity, self._popularity[rank], self._ids[rank], self._names[rank]))
+
+        return [(product_id, name, round(similarity, 3))
+                for _, similarity, _, product_id, name in heapq.nlargest(limit, ranked)]
+
+    def __len__(self):
+        return len(self._ids)
@@ -0,0 +1,48 @@
+import os
+import subprocess
+import sys
+
+import catalog
+from products import Product
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+SCORE_SCRIPT = """
+import catalog, hashlib
+import numpy as np
+from products import Product
+c = catalog.Catalog([Product.from_dict(p) for p in catalog.generate_products(3000)])
+digest = hashlib.md5()
+for query in ['pro', 'e', 'sony wireless pro headphones with fast charging', 'smart mini lamp with usb-c and a touch panel']:
+    digest.update(c.relevance_scores(np.arange(len(c), dtype=np.int32), query).tobytes())
+print(digest.hexdigest())
+"""
+
+
+def make_catalog(count=500):
+    return catalog.Catalog([Product.from_dict(p) for p in catalog.generate_products(count)])
+
+
+def test_relevance_scores_do_not_depend_on_hash_seed():
+    digests = set()
+    for seed in ('1', '3'):
+        env = dict(os.environ, PYTHONHASHSEED=seed)
+        digests.add(subprocess.check_output([sys.executable, '-c', SCORE_SCRIPT], cwd=ROOT, env=env).strip())
+    assert len(digests) == 1
+
+
+def test_relevance_cursor_pages_cover_every_match_once():
+    c = make_catalog()
+    positions = c.match('pro')
+    expected = c.sort(positions, 'relevance', 'pro').tolist()
+
+    seen = []
+    after = None
+    while True:
+        page = c.top_k(positions, 'relevance', 7, after=after, query='pro')
+        if not len(page):
+            break
+        seen.extend(page.tolist())
+        after = (c.sort_keys(page[-1:], 'relevance', 'pro')[0], int(page[-1]))
+
+    assert seen == expected
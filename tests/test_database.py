@@ -0,0 +1,25 @@
+def test_stale_price_averages_are_recomputed(db):
+    db.add_price_history('p1', 'Headphones', 'Amazon', 100.0)
+    db.add_price_history('p1', 'Headphones', 'Amazon', 80.0)
+    assert db.get_price_stats('p1')['avg_7d'] == 90.0
+
+    # Ten days later the price has not changed, so nothing new was recorded
+    conn = db.get_connection()
+    with conn:
+        conn.execute("UPDATE price_history SET timestamp = datetime('now', '-10 days')")
+        conn.execute("UPDATE price_stats SET updated_at = datetime('now', '-2 hours')")
+
+    stats = db.get_price_stats('p1')
+    assert stats['avg_7d'] is None
+    assert stats['avg_30d'] == 90.0
+    assert stats['last_price'] == 80.0
+    assert db.get_price_stats('p1') == stats
+
+
+def test_fresh_price_averages_are_not_recomputed(db):
+    db.add_price_history('p1', 'Headphones', 'Amazon', 100.0)
+    conn = db.get_connection()
+    with conn:
+        conn.execute("UPDATE price_history SET timestamp = datetime('now', '-10 days')")
+
+    assert db.get_price_stats('p1')['avg_7d'] == 100.0
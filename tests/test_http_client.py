@@ -0,0 +1,26 @@
+import io
+
+import requests
+
+import http_client
+
+
+def test_stream_holds_slot_until_body_is_read(monkeypatch):
+    client = http_client.HttpClient()
+    limiter = client.limiter('shop.example.com')
+    seen = []
+
+    def request(method, url, **kwargs):
+        response = requests.Response()
+        response.status_code = 200
+        response.raw = io.BytesIO(b'x' * 100)
+        return response
+
+    monkeypatch.setattr(client.session, 'request', request)
+    with client.stream('https://shop.example.com/p/1') as response:
+        for _ in response.iter_content(chunk_size=10):
+            seen.append(limiter.stats()['in_flight'])
+
+    assert seen == [1] * 10
+    assert limiter.stats()['in_flight'] == 0
+    assert limiter.stats()['requests'] == 1
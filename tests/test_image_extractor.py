@@ -0,0 +1,44 @@
+import pytest
+import requests
+
+import image_extractor
+
+PAGE = (b'<html><head><title>Headphones</title></head><body>' + b'<p>filler</p>' * 3000 +
+        b'<img alt="Wireless product photo" src="https://img.example.com/main.jpg"></body></html>')
+
+
+class FakeResponse:
+    """Serves a page in chunks, optionally failing after some of them"""
+
+    headers = {'content-type': 'text/html'}
+    encoding = None
+
+    def __init__(self, data, fail_after=None):
+        self.data = data
+        self.fail_after = fail_after
+        self.read = 0
+
+    def iter_content(self, chunk_size):
+        for i, start in enumerate(range(0, len(self.data), chunk_size)):
+            if i == self.fail_after:
+                raise requests.exceptions.ChunkedEncodingError('connection broken')
+            chunk = self.data[start:start + chunk_size]
+            self.read += len(chunk)
+            yield chunk
+
+
+def test_network_error_is_raised():
+    response = FakeResponse(PAGE, fail_after=1)
+    with pytest.raises(requests.RequestException):
+        image_extractor.extract_image(response, 'https://shop.example.com/p/1')
+
+
+def test_parser_error_falls_back_to_whole_page(monkeypatch):
+    def fail(self, tag, attrs):
+        raise ValueError('bad markup')
+
+    monkeypatch.setattr(image_extractor.ImageTagParser, 'handle_starttag', fail)
+    response = FakeResponse(PAGE)
+    image_url = image_extractor.extract_image(response, 'https://shop.example.com/p/1')
+    assert image_url == 'https://img.example.com/main.jpg'
+    assert response.read == len(PAGE)
@@ -0,0 +1,44 @@
+import os
+import subprocess
+import sys
+import threading
+import time
+
+from image_resolver import ImageResolver
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def test_queued_checks_do_not_delay_exit():
+    script = (
+        "import time\n"
+        "from image_resolver import ImageResolver\n"
+        "resolver = ImageResolver(lambda *key: time.sleep(1) or 'img', workers=2)\n"
+        "for i in range(10):\n"
+        "    resolver.lookup(f'https://img.example.com/{i}.jpg', 'Headphones')\n"
+    )
+    start = time.monotonic()
+    subprocess.run([sys.executable, '-c', script], cwd=ROOT, check=True)
+    assert time.monotonic() - start < 1
+
+
+def test_pending_checks_are_bounded():
+    started = threading.Event()
+    release = threading.Event()
+
+    def resolve(image_url, name, product_url):
+        started.set()
+        release.wait()
+        return image_url
+
+    resolver = ImageResolver(resolve, workers=1, max_pending=2)
+    urls = [f'https://img.example.com/{i}.jpg' for i in range(5)]
+    assert resolver.lookup(urls[0], 'Headphones') is None
+    started.wait(1)
+    assert resolver.resolve_many([(url, 'Headphones', None) for url in urls], timeout=0.1) == [None] * 5
+    # One is being resolved and two are queued; the rest were not scheduled
+    assert resolver.rejected == 2
+
+    release.set()
+    assert resolver.resolve_many([(url, 'Headphones', None) for url in urls[:3]], timeout=1) == urls[:3]
+    assert resolver.resolve_many([(url, 'Headphones', None) for url in urls[3:]], timeout=1) == urls[3:]
@@ -0,0 +1,55 @@
+import json
+
+import pytest
+
+import marketplaces
+from products import Marketplace, Product
+
+PRODUCTS = [
+    Product('a1', 'Sony Wireless Headphones', Marketplace.AMAZON, 99.0),
+    Product('a2', 'Sony Portable Speaker', Marketplace.AMAZON, 59.0),
+]
+
+
+@pytest.fixture
+def adapters(monkeypatch):
+    """Replace the registered adapters with a fast, a slow and a failing stub"""
+    monkeypatch.setattr(marketplaces, '_adapters', {})
+    stubs = [
+        marketplaces.StubAdapter('Fast', PRODUCTS),
+        marketplaces.StubAdapter('Slow', PRODUCTS, delay=0.5, timeout=0.1),
+        marketplaces.StubAdapter('Broken', error=RuntimeError('down')),
+    ]
+    for stub in stubs:
+        marketplaces.register_adapter(stub)
+    return stubs
+
+
+def test_adapter_must_implement_search():
+    with pytest.raises(TypeError):
+        marketplaces.MarketplaceAdapter('Nothing')
+
+
+def test_fan_out_reports_slow_source_as_timeout(adapters):
+    results = {name: (products, status) for name, products, status in marketplaces.fan_out('sony headphones')}
+
+    assert [p['id'] for p in results['Fast'][0]] == ['a1']
+    assert results['Fast'][1]['status'] == 'ok'
+    assert results['Slow'] == ([], {'status': 'timeout', 'count': 0, 'elapsed': results['Slow'][1]['elapsed']})
+    assert results['Slow'][1]['elapsed'] < 0.5
+    assert results['Broken'][1]['status'] == 'error'
+
+
+def test_api_search_marks_partial_results(adapters, db):
+    from app import app
+
+    response = app.test_client().get('/api/search?q=sony')
+    lines = [json.loads(line) for line in response.get_data(as_text=True).splitlines()]
+
+    assert [(line['type'], line.get('source')) for line in lines] == [('products', 'Fast'), ('done', None)]
+    assert [p['id'] for p in lines[0]['products']] == ['a1', 'a2']
+    done = lines[-1]
+    assert done['partial'] is True
+    assert done['total'] == 2
+    assert {name: status['status'] for name, status in done['sources'].items()} == \
+        {'Fast': 'ok', 'Slow': 'timeout', 'Broken': 'error'}
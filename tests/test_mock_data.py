@@ -0,0 +1,66 @@
+import base64
+import json
+
+import pytest
+
+import http_client
+import mock_data
+
+
+def test_reload_catalog_swaps_in_new_indexes(tmp_path, monkeypatch):
+    for name in ('MOCK_PRODUCTS', '_catalog', '_catalog_mtime', 'CATALOG_PATH', 'suggest_index'):
+        monkeypatch.setattr(mock_data, name, getattr(mock_data, name))
+    old_catalog = mock_data.get_catalog()
+    old_index = mock_data.suggest_index
+    old_size = len(old_index)
+
+    path = tmp_path / 'products.jsonl'
+    product = {'id': 'new_001', 'name': 'Zyxel Travel Router', 'marketplace': 'Amazon', 'price': 39.99}
+    path.write_text(json.dumps(product) + '\n')
+    mock_data.reload_catalog(str(path))
+
+    # The live indexes are replaced, not changed in place
+    assert len(old_index) == old_size
+    assert old_catalog.get('new_001') is None
+    assert mock_data.get_catalog().get('new_001').name == 'Zyxel Travel Router'
+    assert [s['id'] for s in mock_data.suggest_products('zyxel')] == ['new_001']
+    assert [p['id'] for p in mock_data.search_products('zyxel')['products']] == ['new_001']
+
+
+def test_rate_limited_check_is_not_recorded(db, monkeypatch):
+    client = http_client.HttpClient()
+    client.set_host_limit('img.example.com', concurrency=1)
+    client.limiter('img.example.com').acquire()
+    monkeypatch.setattr(http_client, 'client', client)
+
+    url = 'https://img.example.com/a.jpg'
+    with pytest.raises(http_client.RateLimitExceeded):
+        mock_data.validate_image_url(url, timeout=0.05)
+    assert db.get_image_validation(url, 3600, 3600) is None
+
+
+@pytest.mark.parametrize('payload', [
+    {'s': 'price_low', 'k': 'cheap', 'id': 'amz_001'},
+    {'s': 'price_low', 'k': None, 'id': 'amz_001'},
+    {'s': 'price_low', 'k': 10.0, 'id': ['amz_001']},
+    [1, 2, 3],
+])
+def test_search_rejects_invalid_cursor(db, payload):
+    from app import app
+
+    cursor = base64.urlsafe_b64encode(json.dumps(payload).encode()).decode()
+    response = app.test_client().get('/search', query_string={'q': '', 'sort_by': 'price_low', 'cursor': cursor})
+    assert response.status_code == 400
+
+
+def test_search_next_link_carries_cursor(db):
+    from app import app
+
+    client = app.test_client()
+    first = mock_data.search_products('', {'sort_by': 'price_low'}, per_page=50)
+    html = client.get('/search', query_string={'q': '', 'sort_by': 'price_low'}).get_data(as_text=True)
+    assert "&page=2&" in html and f"cursor={first['next_cursor']}" in html
+
+    second = client.get('/search', query_string={'q': '', 'sort_by': 'price_low', 'page': 2,
+                                                 'cursor': first['next_cursor']}).get_data(as_text=True)
+    assert '(Page 2 of' in second
@@ -0,0 +1,52 @@
+import subprocess
+import sys
+import time
+
+import price_refresh
+
+
+def add_item(db, product_id, price, product_url=None):
+    db.add_to_watchlist(product_id, f"Product {product_id}", 'Amazon', price, product_url=product_url)
+
+
+def test_refresh_records_changed_prices(db, monkeypatch):
+    add_item(db, 'p1', 100.0)
+    add_item(db, 'p2', 50.0)
+    add_item(db, 'p3', 20.0)
+    source = price_refresh.StubPriceSource({'p1': 90.0, 'p2': 50.0})
+    monkeypatch.setattr(price_refresh, '_fetchers', {None: source})
+
+    result = price_refresh.refresh_watchlist(workers=2)
+
+    assert result == {'checked': 3, 'changed': 1, 'failed': 1}
+    assert sorted(source.calls) == ['p1', 'p2', 'p3']
+    prices = {row[1]: row[4] for row in db.get_watchlist()}
+    assert prices == {'p1': 90.0, 'p2': 50.0, 'p3': 20.0}
+
+
+def test_refresh_fetches_concurrently(db, monkeypatch):
+    for i in range(4):
+        add_item(db, f"p{i}", 10.0, product_url=f"https://shop{i}.example.com/item")
+    source = price_refresh.StubPriceSource({f"p{i}": 9.0 for i in range(4)}, delay=0.2)
+    monkeypatch.setattr(price_refresh, '_fetchers', {None: source})
+
+    start = time.monotonic()
+    result = price_refresh.refresh_watchlist(workers=4)
+
+    assert result['changed'] == 4
+    # Four 0.2 s fetches to different domains overlap
+    assert time.monotonic() - start < 0.6
+
+
+def test_scheduler_lock_is_held_by_one_process(tmp_path, monkeypatch):
+    path = str(tmp_path / 'refresh.lock')
+    monkeypatch.setattr(price_refresh, '_lock_file', None)
+    assert price_refresh.acquire_scheduler_lock(path)
+
+    other = subprocess.run(
+        [sys.executable, '-c', f"import fcntl; f = open({path!r}, 'a'); fcntl.flock(f, fcntl.LOCK_EX | fcntl.LOCK_NB)"],
+        capture_output=True
+    )
+    assert other.returncode != 0
+
+    price_refresh._lock_file.close()
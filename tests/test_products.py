@@ -0,0 +1,20 @@
+import pytest
+
+from products import Marketplace, Product, ProductView
+
+PRODUCT = Product('p1', 'Sony Headphones', Marketplace.AMAZON, 99.0, reviews=12)
+
+
+def test_product_reads_fields_like_a_dict():
+    assert PRODUCT['name'] == 'Sony Headphones'
+    assert PRODUCT.get('reviews') == 12
+    assert PRODUCT[0] == 'p1'
+
+
+@pytest.mark.parametrize('product', [PRODUCT, ProductView(PRODUCT, image='x.jpg')])
+@pytest.mark.parametrize('key', ['count', 'index', '_asdict', 'missing'])
+def test_tuple_methods_are_not_fields(product, key):
+    assert product.get(key) is None
+    assert product.get(key, 'default') == 'default'
+    with pytest.raises(KeyError):
+        product[key]
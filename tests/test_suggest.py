@@ -0,0 +1,37 @@
+from catalog import generate_products
+from suggest import SuggestIndex
+
+PRODUCTS = [
+    {'id': 'p1', 'name': 'Sony Wireless Headphones', 'reviews': 50},
+    {'id': 'p2', 'name': 'Sony Wireless Speaker', 'reviews': 500},
+    {'id': 'p3', 'name': 'Bose Sport Earbuds', 'reviews': 900},
+    {'id': 'p4', 'name': 'Samsung Galaxy Buds', 'reviews': 10},
+]
+
+
+def ids(results):
+    return [product_id for product_id, _, _ in results]
+
+
+def test_prefix_matches_rank_first_by_popularity():
+    index = SuggestIndex(PRODUCTS)
+    assert ids(index.suggest('so')) == ['p2', 'p1']
+    assert ids(index.suggest('sony wireless h'))[0] == 'p1'
+    assert ids(index.suggest('s')) == ['p3', 'p2', 'p1', 'p4']
+
+
+def test_misspelled_and_joined_words():
+    index = SuggestIndex(PRODUCTS)
+    assert ids(index.suggest('sonny wireless'))[:2] == ['p2', 'p1']
+    assert ids(index.suggest('samsunggalaxy')) == ['p4']
+    assert index.suggest('qqq') == []
+
+
+def test_matches_full_scan_on_generated_catalog():
+    products = generate_products(5000)
+    index = SuggestIndex(products)
+    for product in products[:50]:
+        words = product['name'].lower().split()
+        query = ' '.join(words[:2]) + ' ' + words[2][:3]
+        expected = {p['id'] for p in products if f" {query}" in f" {p['name'].lower()}"}
+        assert set(ids(index.suggest(query, limit=len(expected)))) == expected